@@ -1,12 +1,45 @@
-from typing import Dict, Any
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from workflow_nodes import AgenticRAGState, WorkflowNodes
+from semantic_cache import SemanticCache, normalize_question
+
+logger = logging.getLogger(__name__)
+
+# Process-wide exact-match cache of (expires_at, final state), keyed by normalized question text;
+# entries share the semantic cache TTL so promoted answers expire together with their source
+_EXACT_CACHE_MAX_SIZE = 1024
+_EXACT_CACHE: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_EXACT_CACHE_LOCK = threading.Lock()
 
 class AgenticMathRAG:
     """Complete Agentic RAG system for Math Education with Proper Output Guardrails"""
     
-    def __init__(self, workflow_nodes: WorkflowNodes):
+    # Shared defaults copied into every new workflow state; list fields are replaced per call
+    _INITIAL_STATE_TEMPLATE = AgenticRAGState(
+        user_question="",
+        input_guardrails_passed=False,
+        output_guardrails_passed=False,
+        knowledge_base_results=(),
+        web_search_results=(),
+        raw_solution="",
+        final_solution="",
+        feedback_rating=None,
+        feedback_comments=None,
+        error_message=None,
+        guardrail_attempts=0,
+        final_message_id=None
+    )
+    
+    def __init__(self, workflow_nodes: WorkflowNodes, semantic_cache: Optional[SemanticCache] = None):
         self.workflow_nodes = workflow_nodes
+        self.semantic_cache = semantic_cache
         self.workflow_app = self._build_workflow()
     
     def _build_workflow(self):
@@ -15,18 +48,37 @@ class AgenticMathRAG:
         workflow = StateGraph(AgenticRAGState)
 
         # Add nodes
-        workflow.add_node("input_guardrails", self.workflow_nodes.input_guardrails_node)
-        workflow.add_node("vector_search", self.workflow_nodes.vector_search_node)
-        workflow.add_node("web_search", self.workflow_nodes.web_search_node)
-        workflow.add_node("solution_generation", self.workflow_nodes.solution_generation_node)
-        workflow.add_node("output_guardrails", self.workflow_nodes.output_guardrails_node)
+        # Nodes that do network I/O provide async variants so ainvoke/astream never block the event loop
+        workflow.add_node("input_guardrails", RunnableLambda(
+            self.workflow_nodes.input_guardrails_node,
+            afunc=self.workflow_nodes.input_guardrails_node_async
+        ))
+        workflow.add_node("vector_search", RunnableLambda(
+            self.workflow_nodes.vector_search_node,
+            afunc=self.workflow_nodes.vector_search_node_async
+        ))
+        workflow.add_node("web_search", RunnableLambda(
+            self.workflow_nodes.web_search_node,
+            afunc=self.workflow_nodes.web_search_node_async
+        ))
+        workflow.add_node("solution_generation", RunnableLambda(
+            self.workflow_nodes.solution_generation_node,
+            afunc=self.workflow_nodes.solution_generation_node_async
+        ))
+        workflow.add_node("output_guardrails", RunnableLambda(
+            self.workflow_nodes.output_guardrails_node,
+            afunc=self.workflow_nodes.output_guardrails_node_async
+        ))
         workflow.add_node("feedback_collection", self.workflow_nodes.feedback_collection_node)
 
         # Add edges
+        # The local knowledge base search only needs the raw question, so it overlaps the input
+        # guardrails LLM call; the paid web search waits for the guardrail verdict, overlaps its
+        # own knowledge base check and is dropped when that finds a confident match
         workflow.add_edge(START, "input_guardrails")
-        workflow.add_edge("input_guardrails", "vector_search")
-        workflow.add_edge("vector_search", "web_search")
-        workflow.add_edge("web_search", "solution_generation")
+        workflow.add_edge(START, "vector_search")
+        workflow.add_edge("input_guardrails", "web_search")
+        workflow.add_edge(["vector_search", "web_search"], "solution_generation")
         workflow.add_edge("solution_generation", "output_guardrails")
         workflow.add_edge("output_guardrails", "feedback_collection")
         workflow.add_edge("feedback_collection", END)
@@ -37,27 +89,21 @@ class AgenticMathRAG:
     def solve_math_problem(self, question: str) -> Dict[str, Any]:
         """Main method to solve math problems using the complete workflow"""
         
+        # Serve repeated and near-duplicate questions straight from the caches
+        cached_state = self._lookup_cache(question)
+        if cached_state is not None:
+            logger.debug("Cache hit for question: %s", question)
+            return cached_state
+        
         # Initialize state
-        initial_state = AgenticRAGState(
-            user_question=question,
-            input_guardrails_passed=False,
-            output_guardrails_passed=False,
-            knowledge_base_results=[],
-            web_search_results=[],
-            raw_solution="",
-            final_solution="",
-            feedback_rating=None,
-            feedback_comments=None,
-            error_message=None,
-            guardrail_attempts=0
-        )
-        
-        print(f"Processing question: {question}")
-        print("=" * 80)
+        initial_state = self._initial_state(question)
+        
+        logger.debug("Processing question: %s", question)
         
         # Run the workflow
         try:
             final_state = self.workflow_app.invoke(initial_state)
+            self._store_cache(question, final_state)
             
             # Display results
             self._display_results(final_state)
@@ -65,32 +111,139 @@ class AgenticMathRAG:
             return final_state
         
         except Exception as e:
-            print(f"Workflow error: {str(e)}")
+            logger.error("Workflow error: %s", e)
             return {"error": str(e)}
     
-    async def solve_math_problem_async(self, question: str) -> Dict[str, Any]:
-        """Async version of solve_math_problem"""
+    async def solve_math_problem_async(self, question: str, check_cache: bool = True) -> Dict[str, Any]:
+        """Async version of solve_math_problem
+
+        Pass check_cache=False when the caller has already missed via lookup_cache_async.
+        """
+        if check_cache:
+            cached_state = await self.lookup_cache_async(question)
+            if cached_state is not None:
+                return cached_state
+        
         # Initialize state
-        initial_state = AgenticRAGState(
-            user_question=question,
-            input_guardrails_passed=False,
-            output_guardrails_passed=False,
-            knowledge_base_results=[],
-            web_search_results=[],
-            raw_solution="",
-            final_solution="",
-            feedback_rating=None,
-            feedback_comments=None,
-            error_message=None,
-            guardrail_attempts=0
-        )
+        initial_state = self._initial_state(question)
         
         try:
             final_state = await self.workflow_app.ainvoke(initial_state)
+            await asyncio.to_thread(self._store_cache, question, final_state)
             return final_state
         except Exception as e:
             return {"error": str(e)}
     
+    async def astream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """Stream workflow progress as events: node updates, output-guardrail tokens, then the final state
+
+        Output guardrail attempts may run concurrently, so token events from several message ids can
+        interleave; the final event's message_id names the attempt that produced the solution.
+        """
+        cached_state = await self.lookup_cache_async(question)
+        if cached_state is not None:
+            yield {"type": "final", "state": cached_state, "message_id": None}
+            return
+        
+        # Initialize state
+        initial_state = self._initial_state(question)
+        
+        final_state = initial_state
+        async for mode, chunk in self.workflow_app.astream(initial_state, stream_mode=["updates", "messages", "values"]):
+            if mode == "updates":
+                for node, update in chunk.items():
+                    yield {"type": "node", "node": node, "update": update or {}}
+            elif mode == "messages":
+                # Only the output guardrails LLM produces the user-facing solution text
+                message, metadata = chunk
+                if metadata.get("langgraph_node") == "output_guardrails" and message.content:
+                    yield {"type": "token", "delta": message.content, "message_id": message.id}
+            else:
+                final_state = chunk
+        
+        await asyncio.to_thread(self._store_cache, question, final_state)
+        yield {"type": "final", "state": final_state, "message_id": final_state.get("final_message_id")}
+    
+    async def lookup_cache_async(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return a cached final state without running the workflow, or None on a miss"""
+        # Cache lookups embed the question, so keep them off the event loop
+        return await asyncio.to_thread(self._lookup_cache, question)
+    
+    def _initial_state(self, question: str) -> AgenticRAGState:
+        """Shallow-copy the state template and fill in the per-call fields"""
+        initial_state = dict(self._INITIAL_STATE_TEMPLATE)
+        initial_state["user_question"] = question
+        initial_state["knowledge_base_results"] = []
+        initial_state["web_search_results"] = []
+        return initial_state
+    
+    def _lookup_cache(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return a cached final state (exact match first, then semantic), or None on a miss
+
+        The returned state's cache_source records which cache answered ("ExactCache" or "SemanticCache").
+        """
+        key = normalize_question(question)
+        with _EXACT_CACHE_LOCK:
+            entry = _EXACT_CACHE.get(key)
+            if entry is not None:
+                expires_at, final_state = entry
+                if expires_at >= time.time():
+                    _EXACT_CACHE.move_to_end(key)
+                    cached_state = copy.deepcopy(final_state)
+                    cached_state["cache_source"] = "ExactCache"
+                    return cached_state
+                del _EXACT_CACHE[key]
+        
+        if self.semantic_cache is None:
+            return None
+        
+        try:
+            cached = self.semantic_cache.lookup(question)
+        except Exception as e:
+            logger.error("Semantic cache lookup error: %s", e)
+            return None
+        
+        if cached is None:
+            return None
+        
+        cached_state = self._initial_state(question)
+        cached_state["input_guardrails_passed"] = cached["guardrails_passed"]["input"]
+        cached_state["output_guardrails_passed"] = cached["guardrails_passed"]["output"]
+        cached_state["final_solution"] = cached["final_solution"]
+        cached_state["cache_similarity"] = cached["similarity"]
+        self._store_exact(key, cached_state, created_at=cached.get("created_at"))
+        cached_state["cache_source"] = "SemanticCache"
+        return cached_state
+    
+    def _store_exact(self, key: str, final_state: Dict[str, Any], created_at: Optional[float] = None):
+        """Insert a final state into the exact-match cache, evicting the least recently used
+
+        created_at is the wall-clock time the answer was first cached, so promoted semantic
+        cache entries expire when their source entry does.
+        """
+        from config import SEMANTIC_CACHE_TTL_SECONDS
+        
+        expires_at = (created_at if created_at is not None else time.time()) + SEMANTIC_CACHE_TTL_SECONDS
+        with _EXACT_CACHE_LOCK:
+            _EXACT_CACHE[key] = (expires_at, copy.deepcopy(final_state))
+            _EXACT_CACHE.move_to_end(key)
+            if len(_EXACT_CACHE) > _EXACT_CACHE_MAX_SIZE:
+                _EXACT_CACHE.popitem(last=False)
+    
+    def _store_cache(self, question: str, final_state: Dict[str, Any]):
+        """Add a completed workflow result to the exact-match and semantic caches"""
+        if not final_state.get("input_guardrails_passed") or not final_state.get("final_solution"):
+            return
+        
+        self._store_exact(normalize_question(question), final_state)
+        if self.semantic_cache is None:
+            return
+        
+        try:
+            self.semantic_cache.store(question, final_state)
+        except Exception as e:
+            logger.error("Semantic cache store error: %s", e)
+    
     def _display_results(self, state: AgenticRAGState):
         """Display the results of the workflow"""
         
@@ -105,7 +258,7 @@ class AgenticMathRAG:
         if state["knowledge_base_results"]:
             print(f"Found {len(state['knowledge_base_results'])} similar problems")
             for i, result in enumerate(state["knowledge_base_results"][:2], 1):
-                print(f"{i}. Score: {result['score']:.3f} - Topic: {result['topic']}")
+                print(f"{i}. Score: {result.score:.3f} - Topic: {result.topic}")
         else:
             print("No similar problems found in knowledge base")
         
@@ -115,7 +268,7 @@ class AgenticMathRAG:
             for i, result in enumerate(state["web_search_results"][:2], 1):
                 print(f"{i}. {result['title'][:50]}...")
         else:
-            print("No web search performed (good knowledge base match found)")
+            print("No web resources found")
         
         print("\nOUTPUT GUARDRAILS: ")
         if state.get("output_guardrails_passed", False):
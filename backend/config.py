@@ -1,4 +1,5 @@
 import os
+import re
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -10,6 +11,9 @@ os.environ["PORTKEY_API_KEY"] = "your portkey api key"
 # API Configuration
 API_HOST = "0.0.0.0"
 API_PORT = 8000
+API_WORKERS = int(os.environ.get("API_WORKERS", os.cpu_count() or 1))
+DEV_MODE = bool(os.environ.get("DEV"))
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING").upper()
 REACT_FRONTEND_URLS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -19,10 +23,59 @@ REACT_FRONTEND_URLS = [
 # Model Configuration
 DEFAULT_MODEL = "moonshotai/kimi-k2-instruct"
 EMBEDDING_MODEL = "sentence-transformers/all-mpnet-base-v2"
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "onnx")  # "onnx", "onnx-int8", "sentence-transformers", "fastembed" or "infinity"
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "./onnx_model")  # fp32/int8 exports are written here once and reused
+FASTEMBED_MODEL = "BAAI/bge-small-en-v1.5"
+INFINITY_URL = os.environ.get("INFINITY_URL", "http://localhost:7997")  # Infinity/TEI sidecar serving FASTEMBED_MODEL
 VECTOR_COLLECTION = "jee_math_problems"
-VECTOR_SIZE = 768
+VECTOR_SIZE = 384 if EMBEDDING_BACKEND in ("fastembed", "infinity") else 768
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", "./embedding_cache")  # fp16 corpus vectors reused across restarts
+VECTOR_QDRANT_URL = os.environ.get("VECTOR_QDRANT_URL")  # Qdrant server (HNSW); preferred for production
+VECTOR_STORE_PATH = os.environ.get("VECTOR_STORE_PATH", "./qdrant_data")
+HNSW_M = 32
+HNSW_EF_CONSTRUCT = 256
+HNSW_EF_SEARCH = 128
+# A top knowledge base hit this close to the question is confident enough to skip the web search
+KB_CONFIDENT_COSINE_SCORE = 0.85  # cosine similarity, higher is better
+KB_CONFIDENT_L2_DISTANCE = 0.3  # L2 distance, lower is better
+KB_BATCH_MAX_SIZE = 32  # concurrent knowledge base searches coalesced into one batched query
+
+# Semantic Cache Configuration
+SEMANTIC_CACHE_COLLECTION = "math_answer_cache"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_QDRANT_URL = os.environ.get("SEMANTIC_CACHE_QDRANT_URL")  # shared across workers when set
+SEMANTIC_CACHE_PATH = os.environ.get("SEMANTIC_CACHE_PATH", "./semantic_cache_data")
+SEMANTIC_CACHE_TTL_SECONDS = int(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+SEMANTIC_CACHE_EVICTION_INTERVAL = int(os.environ.get("SEMANTIC_CACHE_EVICTION_INTERVAL", "300"))
+
+# Web Search Configuration
+WEB_SEARCH_CACHE_TTL_SECONDS = int(os.environ.get("WEB_SEARCH_CACHE_TTL_SECONDS", "3600"))
+WEB_SEARCH_CACHE_MAX_ENTRIES = 2048
 
 # Guardrails Configuration
+# Guardrail LLM calls go straight to Groq with the policy checks applied locally;
+# set USE_PORTKEY_GUARDRAILS to route them through the Portkey gateway configs below instead.
+USE_PORTKEY_GUARDRAILS = bool(os.environ.get("USE_PORTKEY_GUARDRAILS"))
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+PORTKEY_BASE_URL = "https://api.portkey.ai/v1"
+# Keyword sets are built once at import and the Portkey regexes are derived from them.
+# Patterns keep the original substring semantics, so embedded keywords like "antiderivative" still match.
+MATH_INPUT_KEYWORDS = frozenset({
+    "equation", "solve", "derivative", "integral", "limit", "matrix", "probability", "geometry",
+    "algebra", "calculus", "trigonometry", "statistics", "graph", "function", "find", "calculate",
+    "determine", "evaluate", "area", "perimeter", "volume", "radius", "diameter", "triangle",
+    "circle", "rectangle", "square", "angle", "pythagorean", "theorem", "sin", "cos", "tan",
+    "mathematics", "math", "formula", "explain", "prove", "show", "demonstrate"
+})
+SOLUTION_OUTPUT_KEYWORDS = frozenset({
+    "step", "solve", "answer", "therefore", "hence", "thus", "final", "result", "solution"
+})
+
+def keyword_pattern(keywords) -> str:
+    """Build an unanchored substring alternation, longest keywords first so prefixes never shadow them"""
+    return "(?:" + "|".join(sorted(map(re.escape, keywords), key=lambda k: (-len(k), k))) + ")"
+
 IMPROVED_INPUT_GUARDRAIL_CONFIG = {
     "before_request_hooks": [
         {
@@ -32,7 +85,7 @@ IMPROVED_INPUT_GUARDRAIL_CONFIG = {
                 {
                     "id": "default.regexMatch",
                     "parameters": {
-                        "pattern": r".*(equation|solve|derivative|integral|limit|matrix|probability|geometry|algebra|calculus|trigonometry|statistics|graph|function|find|calculate|determine|evaluate|area|perimeter|volume|radius|diameter|triangle|circle|rectangle|square|angle|pythagorean|theorem|sin|cos|tan|mathematics|math|formula|explain|prove|show|demonstrate).*",
+                        "pattern": keyword_pattern(MATH_INPUT_KEYWORDS),
                         "match_type": "contains",
                         "case_sensitive": False
                     },
@@ -80,7 +133,7 @@ OUTPUT_GUARDRAIL_CONFIG = {
                 {
                     "id": "default.regexMatch",
                     "parameters": {
-                        "pattern": r".*(step|solve|answer|therefore|hence|thus|final|result|solution).*",
+                        "pattern": keyword_pattern(SOLUTION_OUTPUT_KEYWORDS),
                         "match_type": "contains",
                         "case_sensitive": False
                     },
@@ -1,6 +1,16 @@
+import os
+import re
+import hashlib
+import tempfile
+import numpy as np
 import pandas as pd
 from datasets import load_dataset
 from typing import List, Dict, Any
+from embedder import get_embedder
+
+# Subjects kept from JEE Bench, compiled once into a single alternation
+MATH_SUBJECT_PATTERN = re.compile(r'math|mathematics|algebra|calculus|geometry|trigonometry', re.IGNORECASE)
+JEE_BENCH_COLUMNS = ['question', 'description', 'gold', 'type', 'subject', 'index']
 
 def load_jee_bench_data():
     """Load and preprocess JEE Bench dataset, keeping only math questions"""
@@ -8,28 +18,30 @@ def load_jee_bench_data():
         dataset = load_dataset("daman1209arora/jeebench")
         df = dataset['test'].to_pandas()
         
-        df['subject'] = df['subject'].str.lower()
-        math_keywords = ['math', 'mathematics', 'algebra', 'calculus', 'geometry', 'trigonometry']
-        math_df = df[df['subject'].str.contains('|'.join(math_keywords), case=False, na=False)].copy()
+        math_df = df[df['subject'].str.contains(MATH_SUBJECT_PATTERN, na=False, regex=True)]
         
         print(f"Found {len(math_df)} math questions out of {len(df)} total questions")
         
-        knowledge_base = []
-        for idx, row in math_df.iterrows():
-            entry = {
+        # to_dict(orient='records') builds the rows in C instead of one Series per row
+        columns = [column for column in JEE_BENCH_COLUMNS if column in math_df.columns]
+        records = math_df[columns].to_dict(orient='records')
+        
+        knowledge_base = [
+            {
                 'id': f"jee_math_{idx}",
-                'question': row.get('question', 'Question not available'),
-                'description': row.get('description', ''),
-                'answer': row.get('gold', ''),
-                'topic': row.get('type', 'General'),
+                'question': record.get('question', 'Question not available'),
+                'description': record.get('description', ''),
+                'answer': record.get('gold', ''),
+                'topic': record.get('type', 'General'),
                 'difficulty': 'Medium',
                 'metadata': {
                     'source': 'JEE_Bench',
-                    'subject': row.get('subject', 'Mathematics'),
-                    'index': row.get('index', idx)
+                    'subject': record.get('subject', 'Mathematics'),
+                    'index': record.get('index', idx)
                 }
             }
-            knowledge_base.append(entry)
+            for idx, record in zip(math_df.index, records)
+        ]
         
         print(f"Successfully loaded {len(knowledge_base)} math questions into knowledge base")
         return knowledge_base
@@ -64,4 +76,64 @@ def prepare_documents_for_vector_store(knowledge_base: List[Dict[str, Any]]):
         }
         metadatas.append(metadata)
     
-    return documents, metadatas
\ No newline at end of file
+    return documents, metadatas
+
+def embed_documents(documents: List[str], batch_size: int = 64) -> np.ndarray:
+    """Embed documents in fixed-size batches with the shared embedder
+
+    Vectors are cached on disk as float16 keyed by a hash of the document text, so restarts
+    only embed new documents. Embeddings are L2-normalized so the vector store can rank by dot product.
+    """
+    embedder = get_embedder()
+    if not documents:
+        return np.empty((0, embedder.dimension), dtype=np.float32)
+    
+    cache_path = _embedding_cache_path()
+    cache = _load_embedding_cache(cache_path)
+    keys = [hashlib.blake2b(document.encode(), digest_size=16).digest() for document in documents]
+    misses = [i for i, key in enumerate(keys) if key not in cache]
+    print(f"Embedding cache: {len(documents) - len(misses)} hits, {len(misses)} to embed")
+    
+    if misses:
+        vectors = embedder.encode([documents[i] for i in misses], batch_size=batch_size)
+        for i, vector in zip(misses, vectors.astype(np.float16)):
+            cache[keys[i]] = vector
+        _save_embedding_cache(cache_path, cache)
+    
+    # float16 rounding slightly perturbs the norm, so renormalize for dot-product ranking
+    vectors = np.stack([cache[key] for key in keys]).astype(np.float32)
+    return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+def _embedding_cache_path() -> str:
+    """Cache file for the configured backend and model, so switching models never mixes vectors"""
+    from config import EMBEDDING_CACHE_DIR, EMBEDDING_BACKEND, EMBEDDING_MODEL, FASTEMBED_MODEL
+    
+    model = FASTEMBED_MODEL if EMBEDDING_BACKEND in ("fastembed", "infinity") else EMBEDDING_MODEL
+    return os.path.join(EMBEDDING_CACHE_DIR, re.sub(r"[^\w.-]+", "_", f"{EMBEDDING_BACKEND}-{model}") + ".npz")
+
+def _load_embedding_cache(path: str) -> Dict[bytes, np.ndarray]:
+    """Read the hash -> float16 vector cache, or start empty if it is missing or unreadable"""
+    try:
+        with np.load(path) as data:
+            return {key.tobytes(): vector for key, vector in zip(data["keys"], data["vectors"])}
+    except Exception:
+        return {}
+
+def _save_embedding_cache(path: str, cache: Dict[bytes, np.ndarray]):
+    """Write the cache atomically; a failed save is reported and skipped since the cache is optional
+
+    Each writer uses its own temporary file, so workers saving concurrently never interleave writes.
+    """
+    tmp_path = None
+    try:
+        cache_dir = os.path.dirname(path) or "."
+        os.makedirs(cache_dir, exist_ok=True)
+        keys = np.frombuffer(b"".join(cache.keys()), dtype=np.uint8).reshape(len(cache), 16)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            np.savez(f, keys=keys, vectors=np.stack(list(cache.values())))
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Embedding cache save failed ({str(e)}), continuing without it")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -1,7 +1,23 @@
 import dspy
+import hashlib
+import logging
 import pandas as pd
 import os
-from typing import Dict
+import time
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Process-wide TTL + LRU of generated solutions keyed by a digest of (normalized question, retrieved sources)
+_SOLUTION_CACHE_MAX_SIZE = 5000
+_SOLUTION_CACHE_TTL_SECONDS = 24 * 3600
+_SOLUTION_CACHE: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_SOLUTION_CACHE_LOCK = threading.Lock()
+
+# Feedback entries kept for analytics; older entries are dropped from the window
+FEEDBACK_WINDOW_SIZE = 10_000
 
 class DSPyMathOptimizer:
     """DSPy-based optimizer for math education with human feedback"""
@@ -15,7 +31,12 @@ class DSPyMathOptimizer:
         dspy.configure(lm=lm)
         
         self.rag_module = self._create_rag_module()
-        self.feedback_data = []
+        self.feedback_data = deque(maxlen=FEEDBACK_WINDOW_SIZE)
+        # Running aggregates over the window so analytics never rescan feedback_data
+        self._rating_sum = 0
+        self._rating_counts = Counter()
+        # Feedback arrives from the workflow's feedback executor and the /feedback route concurrently
+        self._feedback_lock = threading.Lock()
         
     def _create_rag_module(self):
         """Create DSPy RAG module for math problems"""
@@ -31,13 +52,35 @@ class DSPyMathOptimizer:
         
         return MathRAG()
     
-    def solve_problem(self, question: str, context: str = ""):
-        """Solve a math problem using the RAG module"""
+    def solve_problem(self, question: str, context: str = "", retrieval_key: Optional[str] = None):
+        """Solve a math problem using the RAG module
+
+        retrieval_key identifies the retrieved sources (knowledge base ids, web URLs); when given it stands
+        in for the context text in the cache key, so reruns that retrieve the same sources reuse the solution.
+        """
+        normalized_question = " ".join(question.lower().split())
+        sources = retrieval_key if retrieval_key is not None else context
+        key = hashlib.blake2b(f"{normalized_question}|{sources}".encode(), digest_size=16).hexdigest()
+        with _SOLUTION_CACHE_LOCK:
+            entry = _SOLUTION_CACHE.get(key)
+            if entry is not None:
+                expires_at, solution = entry
+                if expires_at >= time.monotonic():
+                    _SOLUTION_CACHE.move_to_end(key)
+                    return solution
+                del _SOLUTION_CACHE[key]
+        
         try:
             result = self.rag_module(question=question, context=context)
-            return result.solution
         except Exception as e:
             return f"Error solving problem: {e}"
+        
+        with _SOLUTION_CACHE_LOCK:
+            _SOLUTION_CACHE[key] = (time.monotonic() + _SOLUTION_CACHE_TTL_SECONDS, result.solution)
+            _SOLUTION_CACHE.move_to_end(key)
+            if len(_SOLUTION_CACHE) > _SOLUTION_CACHE_MAX_SIZE:
+                _SOLUTION_CACHE.popitem(last=False)
+        return result.solution
     
     def collect_feedback(self, question: str, generated_solution: str, rating: int, comments: dict):
         """Collect human feedback"""
@@ -48,29 +91,32 @@ class DSPyMathOptimizer:
             "comments": comments,
             "timestamp": pd.Timestamp.now()
         }
-        self.feedback_data.append(feedback_entry)
-        print(f"Feedback collected: Rating {rating}/5")
+        with self._feedback_lock:
+            if len(self.feedback_data) == self.feedback_data.maxlen:
+                evicted_rating = self.feedback_data[0]["rating"]
+                self._rating_sum -= evicted_rating
+                self._rating_counts[evicted_rating] -= 1
+                if not self._rating_counts[evicted_rating]:
+                    del self._rating_counts[evicted_rating]
+            self.feedback_data.append(feedback_entry)
+            self._rating_sum += rating
+            self._rating_counts[rating] += 1
+        logger.debug("Feedback collected: Rating %d/5", rating)
     
     def get_feedback_analytics(self):
         """Get feedback analytics"""
-        if not self.feedback_data:
+        with self._feedback_lock:
+            if not self.feedback_data:
+                return {
+                    "total_feedback": 0,
+                    "average_rating": 0,
+                    "rating_distribution": {}
+                }
+            
+            total = len(self.feedback_data)
+            
             return {
-                "total_feedback": 0,
-                "average_rating": 0,
-                "rating_distribution": {}
-            }
-        
-        df = pd.DataFrame(self.feedback_data)
-        total = len(self.feedback_data)
-        avg_rating = df['rating'].mean()
-        
-        rating_dist = {}
-        for f in self.feedback_data:
-            rating = f["rating"]
-            rating_dist[rating] = rating_dist.get(rating, 0) + 1
-        
-        return {
-            "total_feedback": total,
-            "average_rating": round(avg_rating, 2),
-            "rating_distribution": rating_dist
-        }
\ No newline at end of file
+                "total_feedback": total,
+                "average_rating": round(self._rating_sum / total, 2),
+                "rating_distribution": dict(self._rating_counts)
+            }
\ No newline at end of file
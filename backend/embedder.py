@@ -0,0 +1,199 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+import numpy as np
+from typing import List
+from langchain_core.embeddings import Embeddings
+
+# Process-wide embedder shared by ingestion, retrieval and the semantic cache
+_EMBEDDER = None
+_EMBEDDER_LOCK = threading.Lock()
+
+class OnnxEmbedder:
+    """Sentence embeddings from an ONNX Runtime export of the model (mean pooling, L2-normalized)
+
+    With export_dir set, the export (dynamically quantized to int8 VNNI kernels when quantize is set)
+    is written there once and later starts load it without PyTorch.
+    """
+
+    def __init__(self, model_name: str, max_length: int = 384, export_dir: str = None, quantize: bool = False):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = max((os.cpu_count() or 2) // 2, 1)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if export_dir:
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                self._export(model_name, export_dir, quantize),
+                file_name="model_quantized.onnx" if quantize else "model.onnx",
+                provider="CPUExecutionProvider",
+                session_options=session_options
+            )
+        else:
+            self.model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name, export=True, provider="CPUExecutionProvider", session_options=session_options
+            )
+        self.max_length = max_length
+        self.dimension = self.model.config.hidden_size
+
+    @staticmethod
+    def _export(model_name: str, export_dir: str, quantize: bool) -> str:
+        """Export (and optionally int8-quantize) the model under export_dir unless a previous run already did
+
+        Each process builds in its own temporary directory and publishes it with an atomic rename,
+        so workers starting together never read a half-written export.
+        """
+        suffix = "int8" if quantize else "fp32"
+        save_dir = os.path.join(export_dir, re.sub(r"[^\w.-]+", "_", model_name) + f"-{suffix}")
+        if os.path.isdir(save_dir):
+            return save_dir
+
+        from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+        os.makedirs(export_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=export_dir)
+        try:
+            model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            model.save_pretrained(tmp_dir)
+            if quantize:
+                ORTQuantizer.from_pretrained(model).quantize(
+                    save_dir=tmp_dir,
+                    quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                )
+            os.replace(tmp_dir, save_dir)
+        except OSError:
+            # Another process published the export first
+            if not os.path.isdir(save_dir):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return save_dir
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed texts in batches and return a (len(texts), dimension) float32 array"""
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np"
+            )
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None))
+
+        if not batches:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.concatenate(batches).astype(np.float32, copy=False)
+
+class SentenceTransformerEmbedder:
+    """Sentence embeddings from the PyTorch sentence-transformers model (L2-normalized)"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed texts in batches and return a (len(texts), dimension) float32 array"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        ).astype(np.float32, copy=False)
+
+class FastEmbedEmbedder:
+    """Sentence embeddings from Qdrant's fastembed (quantized ONNX weights, L2-normalized)"""
+
+    def __init__(self, model_name: str):
+        from fastembed import TextEmbedding
+
+        self.model = TextEmbedding(model_name=model_name, threads=os.cpu_count())
+        self.dimension = len(next(iter(self.model.embed(["dimension probe"]))))
+
+    def encode(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        """Embed texts in batches and return a (len(texts), dimension) float32 array"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack(list(self.model.embed(texts, batch_size=batch_size))).astype(np.float32, copy=False)
+
+class InfinityEmbedder:
+    """Sentence embeddings from an Infinity/TEI server's OpenAI-compatible endpoint (L2-normalized)
+
+    Batches are sent concurrently over the shared connection pool so the server's dynamic batching can coalesce them.
+    """
+
+    def __init__(self, base_url: str, model_name: str, max_concurrency: int = 8):
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self._executor = None
+        self.dimension = self._embed_batch(["dimension probe"]).shape[1]
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        from http_clients import HTTP_CLIENT
+
+        response = HTTP_CLIENT.post(f"{self.base_url}/embeddings", json={"model": self.model_name, "input": texts})
+        response.raise_for_status()
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        vectors = np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+    def encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed texts in batches and return a (len(texts), dimension) float32 array"""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        batches = [texts[start:start + batch_size] for start in range(0, len(texts), batch_size)]
+        if len(batches) == 1:
+            return self._embed_batch(batches[0])
+
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+
+            # Kept for the embedder's lifetime instead of spawning threads on every call
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="infinity")
+        return np.concatenate(list(self._executor.map(self._embed_batch, batches)))
+
+def get_embedder():
+    """Return the process-wide embedder, loading it on first use"""
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        with _EMBEDDER_LOCK:
+            if _EMBEDDER is None:
+                # Import configuration from config
+                from config import EMBEDDING_MODEL, EMBEDDING_BACKEND, FASTEMBED_MODEL, ONNX_MODEL_DIR, INFINITY_URL
+
+                if EMBEDDING_BACKEND == "onnx":
+                    _EMBEDDER = OnnxEmbedder(EMBEDDING_MODEL, export_dir=ONNX_MODEL_DIR)
+                elif EMBEDDING_BACKEND == "onnx-int8":
+                    _EMBEDDER = OnnxEmbedder(EMBEDDING_MODEL, export_dir=ONNX_MODEL_DIR, quantize=True)
+                elif EMBEDDING_BACKEND == "fastembed":
+                    _EMBEDDER = FastEmbedEmbedder(FASTEMBED_MODEL)
+                elif EMBEDDING_BACKEND == "infinity":
+                    _EMBEDDER = InfinityEmbedder(INFINITY_URL, FASTEMBED_MODEL)
+                else:
+                    _EMBEDDER = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+    return _EMBEDDER
+
+class SharedEmbeddings(Embeddings):
+    """LangChain embeddings adapter over the process-wide embedder"""
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_embedder().encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_embedder().encode([text])[0].tolist()
@@ -1,17 +1,25 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from prometheus_client import Counter, make_asgi_app
 from typing import List, Dict, Any, Optional, AsyncGenerator
+from dataclasses import dataclass, field, fields
 import asyncio
-import json
+import orjson
+import time
 import uuid
 from datetime import datetime
 import logging
 
 # Import system components
 from main import initialize_system
-from config import API_HOST, API_PORT, REACT_FRONTEND_URLS
+from agentic_rag import AgenticMathRAG
+from dspy_optimizer import DSPyMathOptimizer
+from mcp_integration import MCPMathServer
+from config import API_HOST, API_PORT, API_WORKERS, DEV_MODE, LOG_LEVEL, REACT_FRONTEND_URLS
+from logging_setup import configure_logging
+from http_clients import BLOCKING_EXECUTOR, aclose_http_clients
 
 # Setup FastAPI
 app = FastAPI(
@@ -29,12 +37,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Prometheus metrics
+app.mount("/metrics", make_asgi_app())
+CACHE_LOOKUPS = Counter(
+    "math_solve_cache_lookups_total",
+    "Answer cache lookups made by /solve, by result",
+    ["result"]
+)
+
 # Logging setup
-logging.basicConfig(level=logging.INFO)
+configure_logging(LOG_LEVEL)
 logger = logging.getLogger(__name__)
+# Session records have their own logger pinned to INFO, so they are kept when LOG_LEVEL
+# (WARNING by default) silences the rest of the application's informational output
+session_logger = logging.getLogger("mathagent.sessions")
+session_logger.setLevel(logging.INFO)
+
+# Long-running background tasks started on startup (kept referenced so they are not collected)
+BACKGROUND_TASKS = []
+
+# Session records are queued by /solve and written in batches by session_log_worker
+SESSION_LOG_QUEUE: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+SESSION_LOG_BATCH_SIZE = 100
+SESSION_LOG_FLUSH_SECONDS = 5.0
+
+# Memoized MCP availability so request bursts do not re-probe the server
+MCP_AVAILABILITY_TTL = 5.0
+_MCP_STATE = {"ok": False, "exp": 0.0}
+
+@dataclass(frozen=True, slots=True)
+class SystemComponents:
+    """Typed container for the initialized system, built once at startup and stored on app.state"""
+    math_rag_system: Optional[AgenticMathRAG] = None
+    knowledge_base: List[Dict[str, Any]] = field(default_factory=list)
+    vector_store_manager: Optional[Any] = None
+    semantic_cache: Optional[Any] = None
+    web_search_manager: Optional[Any] = None
+    dspy_optimizer: Optional[DSPyMathOptimizer] = None
+    mcp_server: Optional[MCPMathServer] = None
+    llm_input_guardrails: Optional[Any] = None
+    llm_output_guardrails: Optional[Any] = None
+    workflow_nodes: Optional[Any] = None
+    # Derived once at startup
+    kb_stats: Optional[Dict[str, Any]] = None
 
-# Global system components (initialized on startup)
-SYSTEM_COMPONENTS = {}
+    def initialized_components(self) -> List[str]:
+        """Names of the system components that were initialized"""
+        return [f.name for f in fields(self) if f.name != "kb_stats" and getattr(self, f.name)]
+
+# Empty container until startup completes
+app.state.components = SystemComponents()
 
 class MathQuestion(BaseModel):
     question: str = Field(..., description="The math question to solve")
@@ -55,6 +107,10 @@ class FeedbackData(BaseModel):
     rating: int = Field(..., ge=1, le=5, description="Rating from 1 to 5")
     comments: Dict[str, str] = Field(default_factory=dict)
 
+class BatchSearchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1, max_length=64, description="Questions to search the knowledge base for")
+    k: int = Field(default=3, ge=1, le=20, description="Results per question")
+
 class SystemStatus(BaseModel):
     status: str
     components: Dict[str, bool]
@@ -68,18 +124,74 @@ class StreamResponse(BaseModel):
     session_id: str
     data: Optional[Dict[str, Any]] = None
 
+def sse(obj: Dict[str, Any]) -> bytes:
+    """Encode a payload as a server-sent event frame"""
+    return b"data: " + orjson.dumps(obj) + b"\n\n"
+
+def summarize_update(update: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a workflow node's state update to small progress fields for the stream"""
+    summary = {}
+    for key, value in update.items():
+        if isinstance(value, list):
+            summary[key] = len(value)
+        elif key == "error_message" or isinstance(value, (bool, int, float)):
+            summary[key] = value
+    return summary
+
+def guardrail_confidence(guardrails_passed: Dict[str, bool]) -> float:
+    """Confidence of a solution from its guardrail outcome"""
+    return 1.0 if all(guardrails_passed.values()) else 0.7
+
+def compute_knowledge_base_stats(knowledge_base: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Collect topics, subjects and sources in a single pass over the knowledge base"""
+    topics, subjects, sources = set(), set(), set()
+    for item in knowledge_base:
+        topics.add(item["topic"])
+        subjects.add(item["metadata"]["subject"])
+        sources.add(item["metadata"]["source"])
+    
+    return {
+        "total_problems": len(knowledge_base),
+        "topics": list(topics),
+        "subjects": list(subjects),
+        "sources": list(sources)
+    }
+
+def mcp_ok(components: SystemComponents) -> bool:
+    """MCP availability, re-probed at most once every MCP_AVAILABILITY_TTL seconds"""
+    now = time.monotonic()
+    if now > _MCP_STATE["exp"]:
+        available = components.mcp_server.is_available() if components.mcp_server else False
+        _MCP_STATE.update(ok=available, exp=now + MCP_AVAILABILITY_TTL)
+    return _MCP_STATE["ok"]
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize system components on FastAPI startup"""
-    global SYSTEM_COMPONENTS
     try:
         logger.info("Initializing Agentic RAG system...")
-        SYSTEM_COMPONENTS = await initialize_system()
+        asyncio.get_running_loop().set_default_executor(BLOCKING_EXECUTOR)
+        system_components = await initialize_system()
+        components = SystemComponents(
+            **system_components,
+            kb_stats=compute_knowledge_base_stats(system_components['knowledge_base'])
+        )
+        app.state.components = components
+        BACKGROUND_TASKS.append(asyncio.create_task(session_log_worker()))
+        if components.semantic_cache:
+            BACKGROUND_TASKS.append(asyncio.create_task(components.semantic_cache.run_eviction_loop()))
         logger.info("System initialization complete!")
     except Exception as e:
-        logger.error(f"Failed to initialize system: {str(e)}")
+        logger.error("Failed to initialize system: %s", e)
         raise
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close the shared HTTP connection pools"""
+    for task in BACKGROUND_TASKS:
+        task.cancel()
+    await aclose_http_clients()
+
 
 @app.get("/", response_model=Dict[str, str])
 async def root():
@@ -92,50 +204,68 @@ async def root():
     }
 
 @app.get("/health", response_model=SystemStatus)
-async def health_check():
+async def health_check(request: Request):
     """System health check"""
     try:
+        c = request.app.state.components
         components = {
-            "knowledge_base": len(SYSTEM_COMPONENTS.get('knowledge_base', [])) > 0,
-            "vector_store": SYSTEM_COMPONENTS.get('vector_store_manager') is not None,
-            "guardrails": (SYSTEM_COMPONENTS.get('llm_input_guardrails') is not None and 
-                          SYSTEM_COMPONENTS.get('llm_output_guardrails') is not None),
-            "web_search": SYSTEM_COMPONENTS.get('web_search_manager') is not None,
-            "dspy_optimizer": SYSTEM_COMPONENTS.get('dspy_optimizer') is not None,
-            "mcp_server": SYSTEM_COMPONENTS.get('mcp_server') is not None
+            "knowledge_base": len(c.knowledge_base) > 0,
+            "vector_store": c.vector_store_manager is not None,
+            "guardrails": c.llm_input_guardrails is not None and c.llm_output_guardrails is not None,
+            "web_search": c.web_search_manager is not None,
+            "dspy_optimizer": c.dspy_optimizer is not None,
+            "mcp_server": c.mcp_server is not None
         }
         
-        mcp_server = SYSTEM_COMPONENTS.get('mcp_server')
-        mcp_available = mcp_server.is_available() if mcp_server else False
-        
         return SystemStatus(
             status="healthy" if all(components.values()) else "degraded",
             components=components,
-            knowledge_base_size=len(SYSTEM_COMPONENTS.get('knowledge_base', [])),
-            total_feedback=len(SYSTEM_COMPONENTS.get('dspy_optimizer', {}).feedback_data or []),
-            mcp_available=mcp_available
+            knowledge_base_size=len(c.knowledge_base),
+            total_feedback=len(c.dspy_optimizer.feedback_data) if c.dspy_optimizer else 0,
+            mcp_available=mcp_ok(c)
         )
     except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=500, detail="Health check failed")
 
 @app.post("/solve", response_model=MathSolution)
-async def solve_math_problem(question_data: MathQuestion, background_tasks: BackgroundTasks):
+async def solve_math_problem(question_data: MathQuestion, request: Request):
     """Solve a math problem using the Agentic RAG system with optional MCP integration"""
     start_time = asyncio.get_event_loop().time()
     session_id = str(uuid.uuid4())
     
     try:
-        logger.info(f"Processing question: {question_data.question}")
+        logger.info("Processing question: %s", question_data.question)
         
-        math_rag_system = SYSTEM_COMPONENTS.get('math_rag_system')
-        mcp_server = SYSTEM_COMPONENTS.get('mcp_server')
+        c = request.app.state.components
+        math_rag_system = c.math_rag_system
+        mcp_server = c.mcp_server
         
         if not math_rag_system:
             raise HTTPException(status_code=500, detail="Math RAG system not initialized")
         
+        # Check the answer caches before routing, so hits never reach MCP or the workflow
+        cached = await math_rag_system.lookup_cache_async(question_data.question)
+        if cached is not None:
+            CACHE_LOOKUPS.labels(result="hit").inc()
+            guardrails_passed = {
+                "input": cached["input_guardrails_passed"],
+                "output": cached["output_guardrails_passed"]
+            }
+            # The cached answer's own confidence, scaled by how closely a semantic match fits this question
+            return MathSolution(
+                question=question_data.question,
+                solution=cached["final_solution"],
+                confidence=guardrail_confidence(guardrails_passed) * cached.get("cache_similarity", 1.0),
+                sources=[cached.get("cache_source", "SemanticCache")],
+                processing_time=asyncio.get_event_loop().time() - start_time,
+                guardrails_passed=guardrails_passed,
+                session_id=session_id
+            )
+        CACHE_LOOKUPS.labels(result="miss").inc()
+        
         # Choose processing method based on use_mcp flag
-        if question_data.use_mcp and mcp_server and mcp_server.is_available():
+        if question_data.use_mcp and mcp_ok(c):
             try:
                 logger.info("Using MCP tools for processing")
                 solution_text = await mcp_server.solve_with_mcp(question_data.question)
@@ -143,9 +273,9 @@ async def solve_math_problem(question_data: MathQuestion, background_tasks: Back
                 sources = ["MCP Tools"]
                 
             except Exception as mcp_error:
-                logger.warning(f"MCP processing failed: {str(mcp_error)}, falling back to RAG")
+                logger.warning("MCP processing failed: %s, falling back to RAG", mcp_error)
                 # Fallback to existing RAG system
-                result = math_rag_system.solve_math_problem(question_data.question)
+                result = await math_rag_system.solve_math_problem_async(question_data.question, check_cache=False)
                 solution_text = result.get("final_solution", "No solution generated")
                 guardrails_passed = {
                     "input": result.get("input_guardrails_passed", False),
@@ -154,7 +284,7 @@ async def solve_math_problem(question_data: MathQuestion, background_tasks: Back
                 sources = ["Knowledge Base", "Web Search"] if result.get("web_search_results") else ["Knowledge Base"]
         else:
             # Use existing RAG system (unchanged logic)
-            result = math_rag_system.solve_math_problem(question_data.question)
+            result = await math_rag_system.solve_math_problem_async(question_data.question, check_cache=False)
             solution_text = result.get("final_solution", "No solution generated")
             guardrails_passed = {
                 "input": result.get("input_guardrails_passed", False),
@@ -165,7 +295,7 @@ async def solve_math_problem(question_data: MathQuestion, background_tasks: Back
         processing_time = asyncio.get_event_loop().time() - start_time
         
         # Calculate confidence based on guardrails performance
-        confidence = 1.0 if all(guardrails_passed.values()) else 0.7
+        confidence = guardrail_confidence(guardrails_passed)
         
         # Store session for logging
         session_data = {
@@ -176,7 +306,7 @@ async def solve_math_problem(question_data: MathQuestion, background_tasks: Back
             "use_mcp": question_data.use_mcp
         }
         
-        background_tasks.add_task(log_session, session_data)
+        SESSION_LOG_QUEUE.put_nowait(session_data)
         
         return MathSolution(
             question=question_data.question,
@@ -189,81 +319,85 @@ async def solve_math_problem(question_data: MathQuestion, background_tasks: Back
         )
         
     except Exception as e:
-        logger.error(f"Error processing question: {str(e)}")
+        logger.error("Error processing question: %s", e)
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 @app.post("/solve/stream")
-async def solve_math_problem_stream(question_data: MathQuestion):
+async def solve_math_problem_stream(question_data: MathQuestion, request: Request):
     """Stream the solution process in real-time"""
+    c = request.app.state.components
     
     async def generate_stream():
         session_id = str(uuid.uuid4())
         
         try:
-            # Stream the processing steps
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Starting analysis...', 'session_id': session_id})}\n\n"
-            await asyncio.sleep(0.5)
-            
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Applying input guardrails...', 'session_id': session_id})}\n\n"
-            await asyncio.sleep(0.5)
-            
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Searching knowledge base...', 'session_id': session_id})}\n\n"
-            await asyncio.sleep(0.5)
-            
-            if question_data.use_mcp:
-                yield f"data: {json.dumps({'type': 'status', 'message': 'Using MCP tools...', 'session_id': session_id})}\n\n"
-                await asyncio.sleep(0.5)
-            
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Generating solution...', 'session_id': session_id})}\n\n"
-            await asyncio.sleep(1)
+            yield sse({'type': 'status', 'message': 'Starting analysis...', 'session_id': session_id})
             
             # Process with system
-            math_rag_system = SYSTEM_COMPONENTS.get('math_rag_system')
-            mcp_server = SYSTEM_COMPONENTS.get('mcp_server')
+            math_rag_system = c.math_rag_system
+            mcp_server = c.mcp_server
             
-            if question_data.use_mcp and mcp_server and mcp_server.is_available():
+            solution_text = None
+            message_id = None
+            if question_data.use_mcp and mcp_ok(c):
+                yield sse({'type': 'status', 'message': 'Using MCP tools...', 'session_id': session_id})
                 try:
                     solution_text = await mcp_server.solve_with_mcp(question_data.question)
                     guardrails_passed = {"input": True, "output": True}
                 except:
-                    result = math_rag_system.solve_math_problem(question_data.question)
-                    solution_text = result.get("final_solution", "No solution generated")
-                    guardrails_passed = {
-                        "input": result.get("input_guardrails_passed", False),
-                        "output": result.get("output_guardrails_passed", False)
-                    }
-            else:
-                result = math_rag_system.solve_math_problem(question_data.question)
+                    solution_text = None
+            
+            if solution_text is None:
+                # Relay real workflow progress and the output-guardrail tokens as they arrive
+                result = {}
+                async for event in math_rag_system.astream(question_data.question):
+                    if event['type'] == 'node':
+                        yield sse({
+                            'type': 'status',
+                            'message': f"{event['node'].replace('_', ' ').capitalize()} complete",
+                            'session_id': session_id,
+                            'data': summarize_update(event['update'])
+                        })
+                    elif event['type'] == 'token':
+                        yield sse({
+                            'type': 'token',
+                            'delta': event['delta'],
+                            'message_id': event['message_id'],
+                            'session_id': session_id
+                        })
+                    else:
+                        result = event['state']
+                        message_id = event['message_id']
+                
                 solution_text = result.get("final_solution", "No solution generated")
                 guardrails_passed = {
                     "input": result.get("input_guardrails_passed", False),
                     "output": result.get("output_guardrails_passed", False)
                 }
             
-            yield f"data: {json.dumps({'type': 'status', 'message': 'Applying output guardrails...', 'session_id': session_id})}\n\n"
-            await asyncio.sleep(0.5)
-            
             solution_data = {
                 'type': 'solution',
                 'question': question_data.question,
                 'solution': solution_text,
                 'guardrails_passed': guardrails_passed,
+                # Token events with any other message_id came from discarded guardrail attempts
+                'message_id': message_id,
                 'session_id': session_id
             }
             
-            yield f"data: {json.dumps(solution_data)}\n\n"
-            yield f"data: {json.dumps({'type': 'complete', 'session_id': session_id})}\n\n"
+            yield sse(solution_data)
+            yield sse({'type': 'complete', 'session_id': session_id})
             
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e), 'session_id': session_id})}\n\n"
+            yield sse({'type': 'error', 'message': str(e), 'session_id': session_id})
     
     return StreamingResponse(generate_stream(), media_type="text/event-stream")
 
 @app.post("/feedback")
-async def submit_feedback(feedback: FeedbackData):
+async def submit_feedback(feedback: FeedbackData, request: Request):
     """Submit feedback for a solution"""
     try:
-        dspy_optimizer = SYSTEM_COMPONENTS.get('dspy_optimizer')
+        dspy_optimizer = request.app.state.components.dspy_optimizer
         if not dspy_optimizer:
             raise HTTPException(status_code=500, detail="DSPy optimizer not available")
         
@@ -275,18 +409,18 @@ async def submit_feedback(feedback: FeedbackData):
             comments=feedback.comments
         )
         
-        logger.info(f"Feedback received for session {feedback.session_id}: {feedback.rating}/5")
+        logger.info("Feedback received for session %s: %s/5", feedback.session_id, feedback.rating)
         return {"message": "Feedback submitted successfully", "session_id": feedback.session_id}
         
     except Exception as e:
-        logger.error(f"Error submitting feedback: {str(e)}")
+        logger.error("Error submitting feedback: %s", e)
         raise HTTPException(status_code=500, detail="Failed to submit feedback")
 
 @app.get("/feedback/analytics")
-async def get_feedback_analytics():
+async def get_feedback_analytics(request: Request):
     """Get feedback analytics"""
     try:
-        dspy_optimizer = SYSTEM_COMPONENTS.get('dspy_optimizer')
+        dspy_optimizer = request.app.state.components.dspy_optimizer
         if not dspy_optimizer:
             return {"total_feedback": 0, "average_rating": 0, "rating_distribution": {}}
         
@@ -294,42 +428,42 @@ async def get_feedback_analytics():
         return analytics
         
     except Exception as e:
-        logger.error(f"Error getting analytics: {str(e)}")
+        logger.error("Error getting analytics: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get analytics")
 
 @app.get("/knowledge-base/stats")
-async def get_knowledge_base_stats():
+async def get_knowledge_base_stats(request: Request):
     """Get knowledge base statistics"""
     try:
-        knowledge_base = SYSTEM_COMPONENTS.get('knowledge_base', [])
-        
-        if not knowledge_base:
-            return {
-                "total_problems": 0,
-                "topics": [],
-                "subjects": [],
-                "sources": []
-            }
-        
-        topics = list(set(item["topic"] for item in knowledge_base))
-        subjects = list(set(item["metadata"]["subject"] for item in knowledge_base))
-        sources = list(set(item["metadata"]["source"] for item in knowledge_base))
-        
-        return {
-            "total_problems": len(knowledge_base),
-            "topics": topics,
-            "subjects": subjects,
-            "sources": sources
-        }
+        # The knowledge base is immutable after startup, so the stats are computed once there
+        c = request.app.state.components
+        return c.kb_stats if c.kb_stats is not None else compute_knowledge_base_stats(c.knowledge_base)
     except Exception as e:
-        logger.error(f"Error getting KB stats: {str(e)}")
+        logger.error("Error getting KB stats: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get knowledge base stats")
 
+@app.post("/knowledge-base/search/batch")
+async def batch_knowledge_base_search(search: BatchSearchRequest, request: Request):
+    """Search the knowledge base for several questions in one embedding pass and one vector store request"""
+    workflow_nodes = request.app.state.components.workflow_nodes
+    if not workflow_nodes:
+        raise HTTPException(status_code=500, detail="Workflow nodes not initialized")
+    
+    try:
+        results = await workflow_nodes.batch_vector_search(search.questions, k=search.k)
+        return {"results": [
+            {"question": question, "knowledge_base_results": question_results}
+            for question, question_results in zip(search.questions, results)
+        ]}
+    except Exception as e:
+        logger.error("Error in batch knowledge base search: %s", e)
+        raise HTTPException(status_code=500, detail="Failed to search knowledge base")
+
 @app.get("/mcp/tools")
-async def get_mcp_tools():
+async def get_mcp_tools(request: Request):
     """Get available MCP tools"""
     try:
-        mcp_server = SYSTEM_COMPONENTS.get('mcp_server')
+        mcp_server = request.app.state.components.mcp_server
         if mcp_server:
             return mcp_server.get_tools_info()
         else:
@@ -338,37 +472,55 @@ async def get_mcp_tools():
                 "message": "MCP server not initialized"
             }
     except Exception as e:
-        logger.error(f"Error getting MCP tools: {str(e)}")
+        logger.error("Error getting MCP tools: %s", e)
         return {"available": False, "error": str(e)}
 
 @app.get("/system/components")
-async def get_system_components():
+async def get_system_components(request: Request):
     """Get information about system components"""
     try:
+        initialized = request.app.state.components.initialized_components()
         return {
-            "initialized_components": list(SYSTEM_COMPONENTS.keys()),
-            "total_components": len(SYSTEM_COMPONENTS),
-            "system_status": "operational" if SYSTEM_COMPONENTS else "not_initialized"
+            "initialized_components": initialized,
+            "total_components": len(initialized),
+            "system_status": "operational" if initialized else "not_initialized"
         }
     except Exception as e:
-        logger.error(f"Error getting system components: {str(e)}")
+        logger.error("Error getting system components: %s", e)
         raise HTTPException(status_code=500, detail="Failed to get system components")
 
 
-async def log_session(session_data: Dict[str, Any]):
-    """Log session data for analytics"""
-    try:
-        logger.info(f"Session logged: {session_data['session_id']} - MCP: {session_data.get('use_mcp', False)}")
-    except Exception as e:
-        logger.error(f"Failed to log session: {str(e)}")
+async def session_log_worker():
+    """Drain queued session records and log them in batches of up to SESSION_LOG_BATCH_SIZE"""
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await SESSION_LOG_QUEUE.get()]
+        deadline = loop.time() + SESSION_LOG_FLUSH_SECONDS
+        while len(items) < SESSION_LOG_BATCH_SIZE:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(SESSION_LOG_QUEUE.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        
+        try:
+            session_logger.info("session_batch %s", orjson.dumps(items).decode())
+        except Exception as e:
+            logger.error("Failed to log sessions: %s", e)
 
 
 if __name__ == "__main__":
     import uvicorn
+    # uvloop and httptools ship with uvicorn[standard]; reload only applies to a single dev worker
     uvicorn.run(
         "fastapi_app:app",
         host=API_HOST,
         port=API_PORT,
-        reload=True,
+        reload=DEV_MODE,
+        workers=1 if DEV_MODE else API_WORKERS,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )
\ No newline at end of file
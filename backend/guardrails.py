@@ -1,43 +1,52 @@
 import os
-from langchain_openai import ChatOpenAI
-from portkey_ai import createHeaders
+from http_clients import HTTP_CLIENT, HTTP_ASYNC_CLIENT
 
-def setup_input_guardrails():
-    """Setup LLM with input guardrails using Portkey"""
+def _create_guardrail_llm(portkey_config, model_kwargs):
+    """ChatOpenAI client for Groq, either direct or through the Portkey gateway with the given config"""
+    from langchain_openai import ChatOpenAI
+    
     # Import configuration from config
-    from config import IMPROVED_INPUT_GUARDRAIL_CONFIG, DEFAULT_MODEL
+    from config import DEFAULT_MODEL, USE_PORTKEY_GUARDRAILS, GROQ_BASE_URL, PORTKEY_BASE_URL
+    
+    if USE_PORTKEY_GUARDRAILS:
+        from portkey_ai import createHeaders
+        
+        connection = {
+            "base_url": PORTKEY_BASE_URL,
+            "default_headers": createHeaders(
+                api_key=os.environ.get("PORTKEY_API_KEY"),
+                provider="groq",
+                config=portkey_config
+            )
+        }
+    else:
+        connection = {"base_url": GROQ_BASE_URL}
     
     return ChatOpenAI(
         api_key=os.environ.get("GROQ_API_KEY"),
-        base_url="https://api.portkey.ai/v1",
-        default_headers=createHeaders(
-            api_key=os.environ.get("PORTKEY_API_KEY"),
-            provider="groq",
-            config=IMPROVED_INPUT_GUARDRAIL_CONFIG
-        ),
         model=DEFAULT_MODEL,
         temperature=0.1,
-        model_kwargs={"max_tokens": 100}
+        http_client=HTTP_CLIENT,
+        http_async_client=HTTP_ASYNC_CLIENT,
+        model_kwargs=model_kwargs,
+        **connection
     )
 
-def setup_output_guardrails():
-    """Setup LLM with output guardrails using Portkey"""
-    # Import configuration from config
-    from config import OUTPUT_GUARDRAIL_CONFIG, DEFAULT_MODEL
+def setup_input_guardrails():
+    """Setup LLM for input validation; replies with a compact JSON verdict"""
+    from config import IMPROVED_INPUT_GUARDRAIL_CONFIG
     
-    return ChatOpenAI(
-        api_key=os.environ.get("GROQ_API_KEY"),
-        base_url="https://api.portkey.ai/v1",
-        default_headers=createHeaders(
-            api_key=os.environ.get("PORTKEY_API_KEY"),
-            provider="groq",
-            config=OUTPUT_GUARDRAIL_CONFIG
-        ),
-        model=DEFAULT_MODEL,
-        temperature=0.1,
-        model_kwargs={"max_tokens": 2000}
+    return _create_guardrail_llm(
+        IMPROVED_INPUT_GUARDRAIL_CONFIG,
+        {"max_tokens": 100, "response_format": {"type": "json_object"}}
     )
 
+def setup_output_guardrails():
+    """Setup LLM for output formatting; the result is validated locally by the workflow"""
+    from config import OUTPUT_GUARDRAIL_CONFIG
+    
+    return _create_guardrail_llm(OUTPUT_GUARDRAIL_CONFIG, {"max_tokens": 2000})
+
 def format_solution_manually(solution: str, question: str) -> str:
     """Manual formatting when output guardrails fail"""
     formatted_solution = f"""Solution:
@@ -0,0 +1,20 @@
+import os
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+
+# Process-wide connection pools for outbound HTTP (guardrail LLMs, Tavily, Infinity), so TLS
+# sessions and HTTP/2 connections are reused across requests instead of renegotiated per call
+HTTP_LIMITS = httpx.Limits(max_connections=128, max_keepalive_connections=64)
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=3.0)
+
+HTTP_CLIENT = httpx.Client(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+HTTP_ASYNC_CLIENT = httpx.AsyncClient(http2=True, limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+
+# Shared worker pool for blocking calls (DSPy generation, vector search, cache I/O); installed as
+# the event loop's default executor so every asyncio.to_thread call reuses the same threads
+BLOCKING_EXECUTOR = ThreadPoolExecutor(max_workers=min(64, (os.cpu_count() or 1) * 8), thread_name_prefix="blocking")
+
+async def aclose_http_clients():
+    """Close both shared clients and their pooled connections"""
+    HTTP_CLIENT.close()
+    await HTTP_ASYNC_CLIENT.aclose()
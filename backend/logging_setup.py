@@ -0,0 +1,24 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Background listener that writes queued records to stderr; started once per process
+_LISTENER = None
+
+def configure_logging(level: str = "WARNING"):
+    """Send log records through an in-memory queue so request paths never block on stream writes"""
+    global _LISTENER
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _LISTENER is not None:
+        return
+
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    root.handlers[:] = [QueueHandler(log_queue)]
+    _LISTENER = QueueListener(log_queue, stream_handler)
+    _LISTENER.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_LISTENER.stop)
@@ -2,44 +2,55 @@ import asyncio
 from data_loader import load_jee_bench_data, prepare_documents_for_vector_store
 from guardrails import setup_input_guardrails, setup_output_guardrails
 from vector_store import VectorStoreManager
+from embedder import get_embedder
+from semantic_cache import SemanticCache
 from web_search import WebSearchManager
 from dspy_optimizer import DSPyMathOptimizer
-from mcp_integration import MCPMathServer
+from mcp_integration import get_mcp_server
 from workflow_nodes import WorkflowNodes
 from agentic_rag import AgenticMathRAG
+from logging_setup import configure_logging
+from http_clients import BLOCKING_EXECUTOR, aclose_http_clients
+from config import LOG_LEVEL
 
 async def initialize_system():
     """Initialize the complete Agentic RAG system"""
     print("INITIALIZING AGENTIC MATH RAG SYSTEM")
     print("=" * 80)
     
-    # 1. Load knowledge base
-    print("Loading JEE Bench dataset...")
-    knowledge_base = load_jee_bench_data()
-    
-    # 2. Setup guardrails
-    print("Setting up Portkey guardrails...")
-    llm_input_guardrails = setup_input_guardrails()
-    llm_output_guardrails = setup_output_guardrails()
+    # Steps 1-6 are independent, so run them concurrently
+    print("Loading dataset, guardrails, vector store, web search, DSPy optimizer and MCP server concurrently...")
+    mcp_server = get_mcp_server()
+    (
+        knowledge_base,
+        llm_input_guardrails,
+        llm_output_guardrails,
+        vector_store_manager,
+        _,
+        web_search_manager,
+        dspy_optimizer,
+        _
+    ) = await asyncio.gather(
+        # 1. Load knowledge base
+        asyncio.to_thread(load_jee_bench_data),
+        # 2. Setup guardrails
+        asyncio.to_thread(setup_input_guardrails),
+        asyncio.to_thread(setup_output_guardrails),
+        # 3. Initialize vector store and load the process-wide embedding model once
+        asyncio.to_thread(VectorStoreManager),
+        asyncio.to_thread(get_embedder),
+        # 4. Initialize web search
+        asyncio.to_thread(WebSearchManager),
+        # 5. Initialize DSPy optimizer
+        asyncio.to_thread(DSPyMathOptimizer),
+        # 6. Initialize MCP server
+        mcp_server.initialize()
+    )
     
-    # 3. Initialize vector store
-    print("Initializing Qdrant vector store...")
-    vector_store_manager = VectorStoreManager()
+    # Ingestion needs both the dataset and the vector store
+    print("Indexing knowledge base...")
     documents, metadatas = prepare_documents_for_vector_store(knowledge_base)
-    vector_store_manager.add_documents(documents, metadatas)
-    
-    # 4. Initialize web search
-    print("Setting up Tavily web search...")
-    web_search_manager = WebSearchManager()
-    
-    # 5. Initialize DSPy optimizer
-    print("Setting up DSPy optimizer...")
-    dspy_optimizer = DSPyMathOptimizer()
-    
-    # 6. Initialize MCP server
-    print("Initializing MCP math server...")
-    mcp_server = MCPMathServer()
-    await mcp_server.initialize()
+    await asyncio.to_thread(vector_store_manager.add_documents, documents, metadatas)
     
     # 7. Create workflow nodes
     print("Creating workflow nodes...")
@@ -51,9 +62,13 @@ async def initialize_system():
         dspy_optimizer=dspy_optimizer
     )
     
-    # 8. Initialize complete system
+    # 8. Initialize persistent semantic answer cache (reuses the vector store embeddings)
+    print("Initializing semantic cache...")
+    semantic_cache = SemanticCache(vector_store_manager.embeddings)
+    
+    # 9. Initialize complete system
     print("Initializing Agentic RAG system...")
-    math_rag_system = AgenticMathRAG(workflow_nodes)
+    math_rag_system = AgenticMathRAG(workflow_nodes, semantic_cache=semantic_cache)
     
     print("SYSTEM INITIALIZATION COMPLETE")
     print("=" * 80)
@@ -62,6 +77,7 @@ async def initialize_system():
         'math_rag_system': math_rag_system,
         'knowledge_base': knowledge_base,
         'vector_store_manager': vector_store_manager,
+        'semantic_cache': semantic_cache,
         'web_search_manager': web_search_manager,
         'dspy_optimizer': dspy_optimizer,
         'mcp_server': mcp_server,
@@ -70,7 +86,10 @@ async def initialize_system():
         'workflow_nodes': workflow_nodes
     }
 
-def test_system(system_components):
+# Concurrent test questions in flight, kept under the Groq rate limit
+TEST_CONCURRENCY = 8
+
+async def test_system(system_components):
     """Test the system with sample questions"""
     print("\n TESTING AGENTIC RAG SYSTEM")
     print("=" * 80)
@@ -86,9 +105,21 @@ def test_system(system_components):
         "Explain the Pythagorean theorem with an example"
     ]
 
-    for i, question in enumerate(test_questions, 1):
+    semaphore = asyncio.Semaphore(TEST_CONCURRENCY)
+    
+    async def solve_async(question):
+        async with semaphore:
+            return await math_rag_system.solve_math_problem_async(question)
+    
+    # Run all questions concurrently, then report in order so the output is not interleaved
+    results = await asyncio.gather(*(solve_async(q) for q in test_questions))
+    for i, (question, result) in enumerate(zip(test_questions, results), 1):
         print(f"\n TEST {i}")
-        result = math_rag_system.solve_math_problem(question)
+        print(f"Processing question: {question}")
+        if "error" in result:
+            print(f"Workflow error: {result['error']}")
+        else:
+            math_rag_system._display_results(result)
         print("\n" + "⭐" * 80)
     
     # Display feedback analytics
@@ -103,16 +134,22 @@ def test_system(system_components):
 
 if __name__ == "__main__":
     async def main():
+        # Node progress is logged at DEBUG; set LOG_LEVEL=DEBUG to follow each workflow step
+        configure_logging(LOG_LEVEL)
+        asyncio.get_running_loop().set_default_executor(BLOCKING_EXECUTOR)
+        
         # Initialize system
         system_components = await initialize_system()
         
         # Test system
-        test_system(system_components)
+        await test_system(system_components)
         
         print("\n SYSTEM READY FOR FASTAPI DEPLOYMENT")
         print("Components available:")
         for component_name in system_components.keys():
             print(f"{component_name}")
+        
+        await aclose_http_clients()
     
     # Run the initialization
     asyncio.run(main())
\ No newline at end of file
@@ -1,6 +1,13 @@
 import os
+import re
+import ast
+import math
 import asyncio
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
@@ -11,6 +18,107 @@ from langgraph.prebuilt import create_react_agent
 
 logger = logging.getLogger(__name__)
 
+# Names and AST nodes the calculator tool accepts; anything else is rejected before evaluation
+_CALCULATOR_NAMES = {
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sum": sum, "pow": pow, "sqrt": math.sqrt,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "pi": math.pi, "e": math.e, "log": math.log
+}
+_CALCULATOR_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Call, ast.Name, ast.Load,
+    ast.List, ast.Tuple, ast.operator, ast.unaryop
+)
+
+_CALCULATOR_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_CALCULATOR_UNARYOPS = (ast.UAdd, ast.USub)
+# Bounds that keep every accepted expression cheap: literals are capped and powers only take
+# small literal operands, so inputs like 9^9^9^9 are rejected instead of computed
+_MAX_LITERAL = 10 ** 15
+_MAX_POW_BASE = 10 ** 6
+_MAX_POW_EXPONENT = 1000
+
+def _literal_value(node):
+    """Value of a (possibly signed) numeric literal, or None for any other node"""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _CALCULATOR_UNARYOPS):
+        value = _literal_value(node.operand)
+        return -value if value is not None and isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)):
+        return node.value
+    return None
+
+def _check_power(base, exponent):
+    """Reject powers whose operands are not small numeric literals"""
+    base_value, exponent_value = _literal_value(base), _literal_value(exponent)
+    if base_value is None or exponent_value is None:
+        raise ValueError("Powers must have numeric literal operands")
+    if abs(base_value) > _MAX_POW_BASE or abs(exponent_value) > _MAX_POW_EXPONENT:
+        raise ValueError(f"Powers are limited to |base| <= {_MAX_POW_BASE} and |exponent| <= {_MAX_POW_EXPONENT}")
+
+@lru_cache(maxsize=1024)
+def _compile_expression(expression: str):
+    """Parse, whitelist-check and compile a calculator expression once per distinct string"""
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALCULATOR_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in _CALCULATOR_NAMES:
+            raise ValueError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, complex)):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+            if abs(node.value) > _MAX_LITERAL:
+                raise ValueError(f"Numeric literals are limited to {_MAX_LITERAL}")
+        if isinstance(node, ast.UnaryOp) and not isinstance(node.op, _CALCULATOR_UNARYOPS):
+            raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+        if isinstance(node, ast.BinOp):
+            if not isinstance(node.op, _CALCULATOR_BINOPS):
+                raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+            if isinstance(node.left, (ast.List, ast.Tuple)) or isinstance(node.right, (ast.List, ast.Tuple)):
+                raise ValueError("Lists are only supported as function arguments")
+            if isinstance(node.op, ast.Pow):
+                _check_power(node.left, node.right)
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise ValueError("Only positional calls to allowed functions are supported")
+            # Three-argument pow is modular exponentiation and stays cheap
+            if node.func.id == "pow" and len(node.args) != 3:
+                if len(node.args) != 2:
+                    raise ValueError("pow takes two or three arguments")
+                _check_power(*node.args)
+    return compile(tree, "<calculator>", "eval")
+
+# Derivative lookup for the derivative tool, built once at import rather than per call
+_DERIVATIVES = {
+    "x^2": "2x", "x^3": "3x^2", "sin(x)": "cos(x)",
+    "cos(x)": "-sin(x)", "e^x": "e^x", "ln(x)": "1/x"
+}
+
+# Questions that are nothing but arithmetic are answered without the ReAct agent
+_ARITHMETIC_PATTERN = re.compile(r"^[\d\s\+\-\*\/\(\)\.\^]+$")
+# The shortcut evaluates on a worker thread and gives up on the result after this long
+_ARITHMETIC_TIMEOUT_SECONDS = 2.0
+
+# Agent responses kept per server, keyed by a digest of the question
+_RESPONSE_CACHE_MAX_SIZE = 512
+
+# Process-wide server, so the chat model and agent are built once
+_MCP_SERVER = None
+_MCP_SERVER_LOCK = threading.Lock()
+
+def evaluate_expression(expression: str):
+    """Evaluate a whitelisted arithmetic expression"""
+    return eval(_compile_expression(expression), {"__builtins__": {}}, _CALCULATOR_NAMES)
+
+def get_mcp_server() -> "MCPMathServer":
+    """Return the process-wide MCP math server; call initialize() on it once at startup"""
+    global _MCP_SERVER
+    if _MCP_SERVER is None:
+        with _MCP_SERVER_LOCK:
+            if _MCP_SERVER is None:
+                _MCP_SERVER = MCPMathServer()
+    return _MCP_SERVER
+
 class MCPMathServer:
     """MCP Server for Math Operations with LangChain Integration"""
     
@@ -19,6 +127,8 @@ class MCPMathServer:
         self.tools = []
         self.agent = None
         self.server_config = self._create_server_config()
+        self._responses: "OrderedDict[str, str]" = OrderedDict()
+        self._responses_lock = threading.Lock()
     
     def _create_server_config(self):
         """Create MCP server configuration"""
@@ -33,14 +143,95 @@ class MCPMathServer:
     def _get_math_server_code(self):
         """Get the embedded math server code"""
         return """
+import ast
 import asyncio
 import math
 import sys
 import json
+from functools import lru_cache
 from typing import Dict, Any
 
+ALLOWED_NAMES = {
+    "abs": abs, "round": round, "min": min, "max": max,
+    "sum": sum, "pow": pow, "sqrt": math.sqrt,
+    "sin": math.sin, "cos": math.cos, "tan": math.tan,
+    "pi": math.pi, "e": math.e, "log": math.log
+}
+ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant, ast.Call, ast.Name, ast.Load,
+    ast.List, ast.Tuple, ast.operator, ast.unaryop
+)
+
+ALLOWED_BINOPS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+ALLOWED_UNARYOPS = (ast.UAdd, ast.USub)
+MAX_LITERAL = 10 ** 15
+MAX_POW_BASE = 10 ** 6
+MAX_POW_EXPONENT = 1000
+
+def literal_value(node):
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ALLOWED_UNARYOPS):
+        value = literal_value(node.operand)
+        return -value if value is not None and isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)):
+        return node.value
+    return None
+
+def check_power(base, exponent):
+    base_value, exponent_value = literal_value(base), literal_value(exponent)
+    if base_value is None or exponent_value is None:
+        raise ValueError("Powers must have numeric literal operands")
+    if abs(base_value) > MAX_POW_BASE or abs(exponent_value) > MAX_POW_EXPONENT:
+        raise ValueError(f"Powers are limited to |base| <= {MAX_POW_BASE} and |exponent| <= {MAX_POW_EXPONENT}")
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str):
+    tree = ast.parse(expression, mode="eval")
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in ALLOWED_NAMES:
+            raise ValueError(f"Unknown name: {node.id}")
+        if isinstance(node, ast.Constant):
+            if not isinstance(node.value, (int, float, complex)):
+                raise ValueError(f"Unsupported constant: {node.value!r}")
+            if abs(node.value) > MAX_LITERAL:
+                raise ValueError(f"Numeric literals are limited to {MAX_LITERAL}")
+        if isinstance(node, ast.UnaryOp) and not isinstance(node.op, ALLOWED_UNARYOPS):
+            raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+        if isinstance(node, ast.BinOp):
+            if not isinstance(node.op, ALLOWED_BINOPS):
+                raise ValueError(f"Unsupported operator: {type(node.op).__name__}")
+            if isinstance(node.left, (ast.List, ast.Tuple)) or isinstance(node.right, (ast.List, ast.Tuple)):
+                raise ValueError("Lists are only supported as function arguments")
+            if isinstance(node.op, ast.Pow):
+                check_power(node.left, node.right)
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords:
+                raise ValueError("Only positional calls to allowed functions are supported")
+            if node.func.id == "pow" and len(node.args) != 3:
+                if len(node.args) != 2:
+                    raise ValueError("pow takes two or three arguments")
+                check_power(*node.args)
+    return compile(tree, "<calculator>", "eval")
+
 # Simple MCP-like math server implementation
 class SimpleMathServer:
+    DERIVATIVES = {
+        "x^2": "2x",
+        "x^3": "3x^2", 
+        "sin(x)": "cos(x)",
+        "cos(x)": "-sin(x)",
+        "e^x": "e^x",
+        "ln(x)": "1/x"
+    }
+    INTEGRALS = {
+        "x": "x^2/2 + C",
+        "x^2": "x^3/3 + C",
+        "sin(x)": "-cos(x) + C", 
+        "cos(x)": "sin(x) + C",
+        "1/x": "ln(x) + C"
+    }
+    
     def __init__(self):
         self.tools = {
             "calculate_basic": self.calculate_basic,
@@ -52,14 +243,8 @@ class SimpleMathServer:
     def calculate_basic(self, expression: str) -> str:
         \"\"\"Calculate basic mathematical expressions\"\"\"
         try:
-            # Safe evaluation of basic math expressions
-            allowed_names = {
-                "abs": abs, "round": round, "min": min, "max": max,
-                "sum": sum, "pow": pow, "sqrt": math.sqrt,
-                "sin": math.sin, "cos": math.cos, "tan": math.tan,
-                "pi": math.pi, "e": math.e, "log": math.log
-            }
-            result = eval(expression, {"__builtins__": {}}, allowed_names)
+            # Safe evaluation of basic math expressions (AST-whitelisted, compiled once per expression)
+            result = eval(compile_expression(expression), {"__builtins__": {}}, ALLOWED_NAMES)
             return f"Result: {result}"
         except Exception as e:
             return f"Error: {str(e)}"
@@ -76,26 +261,11 @@ class SimpleMathServer:
     
     def derivative_calculator(self, function: str, variable: str = "x") -> str:
         \"\"\"Calculate derivatives of simple functions\"\"\"
-        derivatives = {
-            "x^2": "2x",
-            "x^3": "3x^2", 
-            "sin(x)": "cos(x)",
-            "cos(x)": "-sin(x)",
-            "e^x": "e^x",
-            "ln(x)": "1/x"
-        }
-        return derivatives.get(function, f"Derivative of {function} requires advanced calculation")
+        return self.DERIVATIVES.get(function, f"Derivative of {function} requires advanced calculation")
     
     def integral_calculator(self, function: str, variable: str = "x") -> str:
         \"\"\"Calculate integrals of simple functions\"\"\"
-        integrals = {
-            "x": "x^2/2 + C",
-            "x^2": "x^3/3 + C",
-            "sin(x)": "-cos(x) + C", 
-            "cos(x)": "sin(x) + C",
-            "1/x": "ln(x) + C"
-        }
-        return integrals.get(function, f"Integral of {function} requires advanced calculation")
+        return self.INTEGRALS.get(function, f"Integral of {function} requires advanced calculation")
     
     def process_request(self, tool_name: str, parameters: Dict[str, Any]) -> str:
         \"\"\"Process a tool request\"\"\"
@@ -118,6 +288,9 @@ if __name__ == "__main__":
     
     async def initialize(self):
         """Initialize MCP client with math tools"""
+        if self.agent is not None:
+            return
+        
         try:
             logger.info("Initializing MCP Math Server...")
             
@@ -130,16 +303,16 @@ if __name__ == "__main__":
                 if self.tools:
                     model_with_tools = model.bind_tools(self.tools)
                     self.agent = create_react_agent(model_with_tools, self.tools)
-                    logger.info(f"MCP Math Server initialized with {len(self.tools)} tools")
+                    logger.info("MCP Math Server initialized with %s tools", len(self.tools))
                 else:
                     logger.warning("No tools available for MCP agent")
                     self.agent = None
             except Exception as e:
-                logger.warning(f"Failed to initialize OpenAI model: {str(e)}. MCP agent will be unavailable.")
+                logger.warning("Failed to initialize OpenAI model: %s. MCP agent will be unavailable.", e)
                 self.agent = None
                 
         except Exception as e:
-            logger.error(f"Failed to initialize MCP server: {str(e)}")
+            logger.error("Failed to initialize MCP server: %s", e)
             self.agent = None
     
     def _create_mock_langchain_tools(self):
@@ -149,25 +322,14 @@ if __name__ == "__main__":
         def mock_calculator(expression: str) -> str:
             """Mock calculator function"""
             try:
-                import math
-                allowed_names = {
-                    "abs": abs, "round": round, "min": min, "max": max,
-                    "sum": sum, "pow": pow, "sqrt": math.sqrt,
-                    "sin": math.sin, "cos": math.cos, "tan": math.tan,
-                    "pi": math.pi, "e": math.e, "log": math.log
-                }
-                result = eval(expression, {"__builtins__": {}}, allowed_names)
+                result = evaluate_expression(expression)
                 return f"Calculation result: {result}"
             except Exception as e:
                 return f"Calculation error: {str(e)}"
         
         def mock_derivative(function: str) -> str:
             """Mock derivative calculator"""
-            derivatives = {
-                "x^2": "2x", "x^3": "3x^2", "sin(x)": "cos(x)",
-                "cos(x)": "-sin(x)", "e^x": "e^x", "ln(x)": "1/x"
-            }
-            return derivatives.get(function, f"Derivative of {function}: requires advanced calculation")
+            return _DERIVATIVES.get(function, f"Derivative of {function}: requires advanced calculation")
         
         tools = [
             Tool(
@@ -186,21 +348,44 @@ if __name__ == "__main__":
     
     async def solve_with_mcp(self, question: str) -> str:
         """Solve a math problem using MCP agent"""
+        if _ARITHMETIC_PATTERN.match(question):
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.to_thread(evaluate_expression, question.replace('^', '**')),
+                    timeout=_ARITHMETIC_TIMEOUT_SECONDS
+                )
+                return f"Calculation result: {result}"
+            except Exception:
+                pass  # Malformed, oversized or slow arithmetic; let the agent explain it
+        
         if not self.agent:
             return "MCP agent not available"
         
+        key = hashlib.blake2b(question.encode(), digest_size=16).hexdigest()
+        with self._responses_lock:
+            if key in self._responses:
+                self._responses.move_to_end(key)
+                return self._responses[key]
+        
         try:
             response = await self.agent.ainvoke({
                 "messages": [{"role": "user", "content": question}]
             })
             
             if hasattr(response, 'messages') and response.messages:
-                return response.messages[-1].content
+                answer = response.messages[-1].content
             else:
-                return str(response)
+                answer = str(response)
+            
+            with self._responses_lock:
+                self._responses[key] = answer
+                self._responses.move_to_end(key)
+                if len(self._responses) > _RESPONSE_CACHE_MAX_SIZE:
+                    self._responses.popitem(last=False)
+            return answer
                 
         except Exception as e:
-            logger.error(f"MCP agent error: {str(e)}")
+            logger.error("MCP agent error: %s", e)
             return f"MCP processing failed: {str(e)}"
     
     def is_available(self) -> bool:
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import re
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+# qdrant_client is imported on first use, so importing agentic_rag does not pull it in
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+logger = logging.getLogger(__name__)
+
+# Namespace for deterministic point ids, so re-caching a question overwrites its entry
+CACHE_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "mathagent/semantic-cache")
+
+def normalize_question(question: str) -> str:
+    """Collapse whitespace and case so trivially different questions share a cache key"""
+    return re.sub(r"\s+", " ", question.strip().lower())
+
+class SemanticCache:
+    """Persistent Qdrant-backed cache of final solutions keyed by question embedding"""
+
+    def __init__(self, embeddings, client: Optional["QdrantClient"] = None):
+        # Import configuration from config
+        from config import (
+            SEMANTIC_CACHE_COLLECTION, SEMANTIC_CACHE_THRESHOLD, VECTOR_SIZE,
+            SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES, SEMANTIC_CACHE_EVICTION_INTERVAL
+        )
+
+        self.embeddings = embeddings
+        self.client = client or self._create_client()
+        self.collection_name = SEMANTIC_CACHE_COLLECTION
+        self.threshold = SEMANTIC_CACHE_THRESHOLD
+        self.vector_size = VECTOR_SIZE
+        self.ttl_seconds = SEMANTIC_CACHE_TTL_SECONDS
+        self.max_entries = SEMANTIC_CACHE_MAX_ENTRIES
+        self.eviction_interval = SEMANTIC_CACHE_EVICTION_INTERVAL
+        self._initialize_collection()
+
+    def _create_client(self) -> "QdrantClient":
+        """Connect to a shared Qdrant server if configured, otherwise use local on-disk storage"""
+        from qdrant_client import QdrantClient
+        from config import SEMANTIC_CACHE_QDRANT_URL, SEMANTIC_CACHE_PATH
+
+        if SEMANTIC_CACHE_QDRANT_URL:
+            return QdrantClient(url=SEMANTIC_CACHE_QDRANT_URL, prefer_grpc=True)
+        try:
+            return QdrantClient(path=SEMANTIC_CACHE_PATH)
+        except RuntimeError as e:
+            # Local storage is locked by another worker process; keep a per-process cache instead
+            logger.warning("Semantic cache storage unavailable (%s), using in-memory cache", e)
+            return QdrantClient(":memory:")
+
+    def _initialize_collection(self):
+        """Create the cache collection if it does not exist yet, or rebuild it after an embedding dimension change"""
+        from qdrant_client.models import Distance, VectorParams
+        
+        if self.client.collection_exists(self.collection_name):
+            stored_size = getattr(self.client.get_collection(self.collection_name).config.params.vectors, "size", None)
+            if stored_size != self.vector_size:
+                # Entries embedded by another backend cannot be compared with new queries anyway
+                logger.warning("Semantic cache has dimension %s, expected %s; recreating it", stored_size, self.vector_size)
+                self.client.delete_collection(self.collection_name)
+        
+        if not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
+            )
+
+    def lookup(self, question: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry closest to the question if it clears the similarity threshold"""
+        vector = self.embeddings.embed_query(question)
+        hits = self.client.query_points(
+            collection_name=self.collection_name,
+            query=vector,
+            limit=1,
+            score_threshold=self.threshold,
+            with_payload=True
+        ).points
+
+        if not hits:
+            return None
+
+        hit = hits[0]
+        self.client.set_payload(
+            collection_name=self.collection_name,
+            payload={"hits": hit.payload.get("hits", 0) + 1},
+            points=[hit.id]
+        )
+        return {**hit.payload, "similarity": float(hit.score)}
+
+    def store(self, question: str, final_state: Dict[str, Any]):
+        """Cache the final solution produced by the workflow for this question"""
+        from qdrant_client.models import PointStruct
+        
+        vector = self.embeddings.embed_query(question)
+        payload = {
+            "question": question,
+            "final_solution": final_state.get("final_solution", ""),
+            "guardrails_passed": {
+                "input": final_state.get("input_guardrails_passed", False),
+                "output": final_state.get("output_guardrails_passed", False)
+            },
+            "created_at": time.time(),
+            "hits": 0
+        }
+        point_id = str(uuid.uuid5(CACHE_NAMESPACE, normalize_question(question)))
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[PointStruct(id=point_id, vector=vector, payload=payload)]
+        )
+
+    def evict(self):
+        """Drop expired entries, then the least valuable 10% (hits per second of age) when over capacity"""
+        from qdrant_client.models import FieldCondition, Filter, FilterSelector, PointIdsList, Range
+        
+        now = time.time()
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="created_at", range=Range(lt=now - self.ttl_seconds))
+            ]))
+        )
+
+        if self.client.count(collection_name=self.collection_name, exact=True).count <= self.max_entries:
+            return
+
+        scores = []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=["hits", "created_at"],
+                with_vectors=False
+            )
+            for point in points:
+                age = max(now - point.payload.get("created_at", now), 1.0)
+                scores.append((point.payload.get("hits", 0) / age, point.id))
+            if offset is None:
+                break
+
+        scores.sort(key=lambda item: item[0])
+        evicted = [point_id for _, point_id in scores[:max(len(scores) // 10, 1)]]
+        self.client.delete(
+            collection_name=self.collection_name,
+            points_selector=PointIdsList(points=evicted)
+        )
+
+    async def run_eviction_loop(self):
+        """Periodically evict cache entries; meant to run as a background task"""
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            try:
+                await asyncio.to_thread(self.evict)
+            except Exception as e:
+                logger.error("Semantic cache eviction error: %s", e)
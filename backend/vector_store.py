@@ -1,15 +1,45 @@
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from typing import List, Dict, Any
+import asyncio
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from langchain_core.documents import Document
+from typing import List, Dict, Any, Optional, Tuple
+from data_loader import embed_documents
+from embedder import SharedEmbeddings
+
+logger = logging.getLogger(__name__)
+
+# Entries kept in each of the query-embedding and search-result LRU caches
+QUERY_CACHE_MAX_SIZE = 1024
+
+# Payload layout shared by bulk uploads, direct queries and the LangChain vector store
+CONTENT_KEY = "page_content"
+METADATA_KEY = "metadata"
+
+# Metadata fields usable in search filters, indexed so Qdrant prefilters instead of scanning
+PAYLOAD_INDEXES = {
+    "subject": "keyword",
+    "topic": "keyword",
+    "difficulty": "keyword",
+    "source": "keyword",
+    "index": "integer"
+}
 
 class VectorStoreManager:
     """Manages Qdrant vector store operations"""
     
+    __slots__ = (
+        "embeddings", "client", "vector_store", "collection_name", "vector_size", "embedding_model",
+        "hnsw_config", "search_params", "metric", "_query_vectors", "_search_results", "_cache_lock"
+    )
+    
     def __init__(self):
+        # langchain_qdrant and qdrant_client are imported on first use to keep module import cheap
+        from qdrant_client import models
+        
         # Import configuration from config
-        from config import EMBEDDING_MODEL, VECTOR_COLLECTION, VECTOR_SIZE
+        from config import EMBEDDING_MODEL, VECTOR_COLLECTION, VECTOR_SIZE, HNSW_M, HNSW_EF_CONSTRUCT, HNSW_EF_SEARCH
         
         self.embeddings = None
         self.client = None
@@ -17,39 +47,229 @@ class VectorStoreManager:
         self.collection_name = VECTOR_COLLECTION
         self.vector_size = VECTOR_SIZE
         self.embedding_model = EMBEDDING_MODEL
+        self.hnsw_config = models.HnswConfigDiff(m=HNSW_M, ef_construct=HNSW_EF_CONSTRUCT, full_scan_threshold=10000)
+        # Quantized prefilter, then rescore the oversampled top-k with the full vectors
+        self.search_params = models.SearchParams(
+            hnsw_ef=HNSW_EF_SEARCH,
+            quantization=models.QuantizationSearchParams(rescore=True, oversampling=2.0)
+        )
+        # DOT distance over L2-normalized embeddings, so returned scores are cosine similarities
+        self.metric = "cosine_similarity"
+        # Repeated questions skip both the embedding pass and the Qdrant query
+        self._query_vectors: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._search_results: "OrderedDict[tuple, list]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         self._initialize_components()
     
     def _initialize_components(self):
         """Initialize embeddings, client and vector store"""
+        from langchain_qdrant import QdrantVectorStore
+        from qdrant_client import models
+        from qdrant_client.models import Distance, VectorParams
+        
         # Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(model_name=self.embedding_model)
+        self.embeddings = SharedEmbeddings()
         
-        # Initialize Qdrant client (in-memory)
-        self.client = QdrantClient(":memory:")
+        # Initialize Qdrant client (server or on-disk storage, kept across restarts)
+        self.client = self._create_client()
         
-        # Create collection
-        self.client.create_collection(
-            collection_name=self.collection_name,
-            vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
-        )
+        # A collection built for another embedding backend has the wrong dimension; rebuild it
+        if self.client.collection_exists(self.collection_name):
+            stored_size = getattr(self.client.get_collection(self.collection_name).config.params.vectors, "size", None)
+            if stored_size != self.vector_size:
+                logger.warning(
+                    "Vector store collection has dimension %s, expected %s; recreating it", stored_size, self.vector_size
+                )
+                self.client.delete_collection(self.collection_name)
+        
+        # Create collection (embeddings are pre-normalized, so dot product equals cosine)
+        if not self.client.collection_exists(self.collection_name):
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                # float16 storage halves the bytes scanned per query; Qdrant converts the float32 uploads
+                vectors_config=VectorParams(
+                    size=self.vector_size,
+                    distance=Distance.DOT,
+                    datatype=models.Datatype.FLOAT16,
+                    on_disk=False
+                ),
+                hnsw_config=self.hnsw_config,
+                quantization_config=models.ScalarQuantization(
+                    scalar=models.ScalarQuantizationConfig(
+                        type=models.ScalarType.INT8,
+                        quantile=0.99,
+                        always_ram=True
+                    )
+                ),
+            )
+            for field_name, field_schema in PAYLOAD_INDEXES.items():
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=f"{METADATA_KEY}.{field_name}",
+                    field_schema=field_schema
+                )
         
         # Create vector store
         self.vector_store = QdrantVectorStore(
             client=self.client,
             collection_name=self.collection_name,
             embedding=self.embeddings,
+            distance=Distance.DOT,
+            content_payload_key=CONTENT_KEY,
+            metadata_payload_key=METADATA_KEY,
         )
     
+    def _create_client(self):
+        """Connect to a Qdrant server if configured, otherwise use local on-disk storage"""
+        from qdrant_client import QdrantClient
+        from config import VECTOR_QDRANT_URL, VECTOR_STORE_PATH
+        
+        if VECTOR_QDRANT_URL:
+            return QdrantClient(url=VECTOR_QDRANT_URL, prefer_grpc=True)
+        try:
+            return QdrantClient(path=VECTOR_STORE_PATH)
+        except RuntimeError as e:
+            # Local storage is locked by another worker process; fall back to a private in-memory store
+            logger.warning("Vector store storage unavailable (%s), using in-memory store", e)
+            return QdrantClient(":memory:")
+    
     def add_documents(self, documents: List[str], metadatas: List[Dict[str, Any]]):
         """Add documents to vector store"""
         print(f"Adding {len(documents)} documents to Qdrant vector store...")
-        self.vector_store.add_texts(texts=documents, metadatas=metadatas)
+        
+        # Embed the whole corpus in one batched pass, then bulk-upload with Qdrant's parallel uploader
+        # using the payload layout the LangChain vector store reads
+        vectors = embed_documents(documents)
+        payloads = [
+            {CONTENT_KEY: document, METADATA_KEY: metadata}
+            for document, metadata in zip(documents, metadatas)
+        ]
+        self.client.upload_collection(
+            collection_name=self.collection_name,
+            vectors=vectors,
+            payload=payloads,
+            # Content-derived ids make re-ingestion on restart an idempotent upsert
+            ids=[str(uuid.uuid5(uuid.NAMESPACE_URL, document)) for document in documents],
+            batch_size=256,
+            parallel=4
+        )
+        
+        # Cached results may no longer be the nearest neighbours
+        with self._cache_lock:
+            self._search_results.clear()
         print("Documents added successfully!")
     
-    def similarity_search_with_score(self, query: str, k: int = 3):
-        """Search for similar documents"""
-        return self.vector_store.similarity_search_with_score(query, k=k)
+    def similarity_search_with_score(self, query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None):
+        """Search for similar documents, optionally restricted to exact metadata matches (e.g. {"subject": "maths"})"""
+        from qdrant_client import models
+        
+        q_norm = " ".join(query.lower().split())
+        key = (q_norm, k, tuple(sorted(filter.items())) if filter else None)
+        with self._cache_lock:
+            if key in self._search_results:
+                self._search_results.move_to_end(key)
+                return list(self._search_results[key])
+        
+        query_filter = None
+        if filter:
+            query_filter = models.Filter(must=[
+                models.FieldCondition(key=f"{METADATA_KEY}.{field}", match=models.MatchValue(value=value))
+                for field, value in filter.items()
+            ])
+        
+        points = self.client.query_points(
+            collection_name=self.collection_name,
+            query=list(self._embed_query(q_norm)),
+            query_filter=query_filter,
+            limit=k,
+            search_params=self.search_params,
+            with_payload=True
+        ).points
+        results = self._to_documents(points)
+        self._cache_put(self._search_results, key, results)
+        return list(results)
+    
+    async def asimilarity_search_with_score(self, query: str, k: int = 3, filter: Optional[Dict[str, Any]] = None):
+        """Async search for similar documents"""
+        return await asyncio.to_thread(self.similarity_search_with_score, query, k, filter)
+    
+    def batch_similarity_search_with_score(self, queries: List[str], k: int = 3):
+        """Search for several queries at once: one embedding pass for the new ones and one Qdrant batch request"""
+        from qdrant_client import models
+        
+        q_norms = [" ".join(query.lower().split()) for query in queries]
+        results = {}
+        vectors = {}
+        with self._cache_lock:
+            for q_norm in q_norms:
+                if (q_norm, k, None) in self._search_results:
+                    results[q_norm] = self._search_results[(q_norm, k, None)]
+                elif q_norm in self._query_vectors:
+                    vectors[q_norm] = self._query_vectors[q_norm]
+        
+        # Deduplicated, order-preserving list of queries that still need a search
+        pending = [q_norm for q_norm in dict.fromkeys(q_norms) if q_norm not in results]
+        to_embed = [q_norm for q_norm in pending if q_norm not in vectors]
+        if to_embed:
+            for q_norm, vector in zip(to_embed, self.embeddings.embed_documents(to_embed)):
+                vectors[q_norm] = tuple(vector)
+                self._cache_put(self._query_vectors, q_norm, vectors[q_norm])
+        
+        if pending:
+            responses = self.client.query_batch_points(
+                collection_name=self.collection_name,
+                requests=[
+                    models.QueryRequest(query=list(vectors[q_norm]), limit=k, params=self.search_params, with_payload=True)
+                    for q_norm in pending
+                ]
+            )
+            for q_norm, response in zip(pending, responses):
+                results[q_norm] = self._to_documents(response.points)
+                self._cache_put(self._search_results, (q_norm, k, None), results[q_norm])
+        
+        return [list(results[q_norm]) for q_norm in q_norms]
+    
+    async def abatch_similarity_search_with_score(self, queries: List[str], k: int = 3):
+        """Async batch search for similar documents"""
+        return await asyncio.to_thread(self.batch_similarity_search_with_score, queries, k)
+    
+    def is_confident_hit(self, score: float) -> bool:
+        """Whether a search score is a close enough match to answer from the knowledge base alone"""
+        from config import KB_CONFIDENT_COSINE_SCORE, KB_CONFIDENT_L2_DISTANCE
+        
+        if self.metric == "cosine_similarity":
+            return score > KB_CONFIDENT_COSINE_SCORE
+        return score < KB_CONFIDENT_L2_DISTANCE
+    
+    def _to_documents(self, points) -> List[Tuple[Document, float]]:
+        """Rebuild (document, score) pairs from the stored payload layout"""
+        return [
+            (Document(
+                page_content=point.payload[CONTENT_KEY],
+                metadata=point.payload[METADATA_KEY]
+            ), point.score)
+            for point in points
+        ]
+    
+    def _embed_query(self, q_norm: str) -> Tuple[float, ...]:
+        """Embed a normalized query, reusing the vector for repeated queries"""
+        with self._cache_lock:
+            if q_norm in self._query_vectors:
+                self._query_vectors.move_to_end(q_norm)
+                return self._query_vectors[q_norm]
+        
+        vector = tuple(self.embeddings.embed_query(q_norm))
+        self._cache_put(self._query_vectors, q_norm, vector)
+        return vector
+    
+    def _cache_put(self, cache: OrderedDict, key, value):
+        """Insert into one of the LRU caches, evicting the least recently used entry"""
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            if len(cache) > QUERY_CACHE_MAX_SIZE:
+                cache.popitem(last=False)
     
     def get_vector_store(self):
         """Get the vector store instance"""
-        return self.vector_store
\ No newline at end of file
+        return self.vector_store
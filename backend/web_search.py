@@ -1,28 +1,95 @@
-from langchain_tavily import TavilySearch
+import os
+import copy
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from http_clients import HTTP_CLIENT, HTTP_ASYNC_CLIENT
+
+TAVILY_SEARCH_URL = "https://api.tavily.com/search"
+
+# Process-wide TTL + LRU cache of raw Tavily responses, keyed by normalized query
+_SEARCH_CACHE: "OrderedDict[str, tuple]" = OrderedDict()
+_SEARCH_CACHE_LOCK = threading.Lock()
 
 class WebSearchManager:
-    """Manages web search operations using Tavily"""
+    """Manages web search operations using Tavily
+    
+    Calls the Tavily REST API over the shared connection pools; the LangChain wrapper
+    opens a new HTTP session per async call.
+    """
+    
+    __slots__ = ("search_options", "headers")
     
     def __init__(self):
-        self.tavily_search = TavilySearch(
-            max_results=5,
-            topic="general",
-            include_answer=True,
-            search_depth="advanced",
-            include_domains=["mathway.com", "wolframalpha.com", "khanacademy.org", "symbolab.com"]
-        )
+        self.search_options = {
+            "max_results": 5,
+            "topic": "general",
+            "include_answer": True,
+            "search_depth": "advanced",
+            "include_domains": ["mathway.com", "wolframalpha.com", "khanacademy.org", "symbolab.com"]
+        }
+        self.headers = {"Authorization": f"Bearer {os.environ.get('TAVILY_API_KEY')}"}
     
     def search(self, query: str):
         """Perform web search"""
-        return self.tavily_search.invoke({"query": query})
+        key = query.strip().lower()
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        response = HTTP_CLIENT.post(TAVILY_SEARCH_URL, json={**self.search_options, "query": query}, headers=self.headers)
+        response.raise_for_status()
+        results = response.json()
+        self._cache_put(key, results)
+        return results
+    
+    async def asearch(self, query: str):
+        """Perform web search without blocking the event loop"""
+        key = query.strip().lower()
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        response = await HTTP_ASYNC_CLIENT.post(TAVILY_SEARCH_URL, json={**self.search_options, "query": query}, headers=self.headers)
+        response.raise_for_status()
+        results = response.json()
+        self._cache_put(key, results)
+        return results
+    
+    def _cache_get(self, key: str):
+        """Return a copy of a fresh cached response, or None on a miss"""
+        with _SEARCH_CACHE_LOCK:
+            entry = _SEARCH_CACHE.get(key)
+            if entry is None:
+                return None
+            expires_at, results = entry
+            if expires_at < time.monotonic():
+                del _SEARCH_CACHE[key]
+                return None
+            _SEARCH_CACHE.move_to_end(key)
+        # Callers may mutate the response, so never hand out the cached object
+        return copy.deepcopy(results)
+    
+    def _cache_put(self, key: str, results):
+        """Cache a response until the TTL expires, evicting the least recently used"""
+        from config import WEB_SEARCH_CACHE_TTL_SECONDS, WEB_SEARCH_CACHE_MAX_ENTRIES
+        
+        with _SEARCH_CACHE_LOCK:
+            _SEARCH_CACHE[key] = (time.monotonic() + WEB_SEARCH_CACHE_TTL_SECONDS, copy.deepcopy(results))
+            _SEARCH_CACHE.move_to_end(key)
+            if len(_SEARCH_CACHE) > WEB_SEARCH_CACHE_MAX_ENTRIES:
+                _SEARCH_CACHE.popitem(last=False)
     
     def process_results(self, results, max_results: int = 3):
         """Process and format web search results"""
         processed_results = []
-        for result in results.get('results', [])[:max_results]:
+        # Walk only the first max_results entries instead of slicing a copy of the list
+        for result in islice(results.get('results') or (), max_results):
+            content = result.get('content') or ''
             processed_results.append({
                 'title': result.get('title', ''),
-                'content': result.get('content', '')[:500],  # Limit content length
+                'content': content if len(content) <= 500 else content[:500],  # Limit content length
                 'url': result.get('url', '')
             })
         return processed_results
\ No newline at end of file
@@ -1,318 +1,635 @@
 import re
-from typing import Dict, List, Optional, TypedDict
+import json
+import logging
+import time
+import atexit
+import asyncio
+import hashlib
+import operator
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Annotated, Dict, List, Optional, TypedDict
 from langchain_core.messages import HumanMessage, SystemMessage
 
+logger = logging.getLogger(__name__)
+
+# Enhanced math keywords - more comprehensive list
+MATH_KEYWORDS = (
+    # Basic operations
+    'equation', 'solve', 'find', 'calculate', 'determine', 'evaluate', 'compute',
+    # Algebra
+    'algebra', 'polynomial', 'quadratic', 'linear', 'variable', 'coefficient',
+    # Calculus
+    'derivative', 'integral', 'limit', 'differential', 'antiderivative',
+    # Geometry
+    'geometry', 'area', 'perimeter', 'volume', 'radius', 'diameter', 'triangle', 
+    'circle', 'rectangle', 'square', 'angle', 'pythagorean', 'theorem',
+    # Trigonometry
+    'trigonometry', 'sin', 'cos', 'tan', 'sine', 'cosine', 'tangent',
+    # General math
+    'mathematics', 'math', 'formula', 'function', 'graph', 'plot',
+    # Statistics
+    'statistics', 'probability', 'mean', 'median', 'mode', 'deviation',
+    # Other math concepts
+    'matrix', 'vector', 'logarithm', 'exponential', 'factorial', 'prime'
+)
+
+# Compiled once so each question is checked in a single C-level scan; keywords keep the
+# original substring semantics (no word boundaries), case-insensitive instead of lowercasing
+MATH_KEYWORD_PATTERN = re.compile("|".join(map(re.escape, MATH_KEYWORDS)), re.IGNORECASE)
+MATH_SYMBOL_PATTERN = re.compile(r'[0-9+\-*/=^()x²³√∫∂∑π]', re.IGNORECASE)
+# A guardrailed solution must mention at least one of these (substring, case-insensitive)
+OUTPUT_REQUIRED_PATTERN = re.compile(r'step|solution|answer', re.IGNORECASE)
+OUTPUT_MIN_LENGTH = 100
+# Questions failing the local checks with fewer words than this are rejected without an LLM verdict
+INPUT_LLM_MIN_WORDS = 6
+
+# Results fetched per question; solution generation uses all of them as context
+NODE_KB_K = 2
+NODE_WEB_K = 2
+
+# Guardrail system prompts never change, so every call shares one immutable message
+INPUT_GUARDRAIL_SYSTEM_MESSAGE = SystemMessage(
+    content='Respond with the JSON object {"verdict": "VALID"} if this is a math question, {"verdict": "INVALID"} otherwise.'
+)
+OUTPUT_GUARDRAIL_SYSTEM_MESSAGE = SystemMessage(
+    content="You are a math tutor providing step-by-step solutions. Always follow the formatting requirements."
+)
+
+# LLM input verdicts per normalized question, so repeats skip the validation round-trip
+INPUT_VERDICT_CACHE_TTL_SECONDS = 3600
+INPUT_VERDICT_CACHE_MAX_SIZE = 10_000
+_INPUT_VERDICT_CACHE: "OrderedDict[bytes, tuple]" = OrderedDict()
+_INPUT_VERDICT_CACHE_LOCK = threading.Lock()
+
+def merge_error_messages(current: Optional[str], new: Optional[str]) -> Optional[str]:
+    """Reducer that keeps errors reported by parallel branches instead of rejecting the update"""
+    if not new:
+        return current
+    if not current:
+        return new
+    return f"{current}; {new}"
+
+@dataclass(slots=True)
+class KBHit:
+    """A knowledge base search result"""
+    id: Optional[str]
+    question: str
+    answer: str
+    topic: str
+    score: float
+    content: str
+
 class AgenticRAGState(TypedDict):
-    """State for the Agentic RAG workflow"""
+    """State for the Agentic RAG workflow
+
+    vector_search runs in parallel with input_guardrails and web_search, so the fields they
+    write carry reducers and every node returns only the keys it updates.
+
+    knowledge_base_results are ordered best first, and their score follows
+    VectorStoreManager.metric (cosine similarity, higher is better); use
+    VectorStoreManager.is_confident_hit rather than comparing scores directly.
+    """
     user_question: str
     input_guardrails_passed: bool
     output_guardrails_passed: bool
-    knowledge_base_results: List[Dict]
-    web_search_results: List[Dict]
+    knowledge_base_results: Annotated[List[KBHit], operator.add]
+    web_search_results: Annotated[List[Dict], operator.add]
     raw_solution: str
     final_solution: str
     feedback_rating: Optional[int]
     feedback_comments: Optional[Dict]
-    error_message: Optional[str]
+    error_message: Annotated[Optional[str], merge_error_messages]
     guardrail_attempts: int
+    # Id of the output guardrails LLM message that became final_solution; the async node runs
+    # attempts concurrently, so streamed tokens from other message ids are discarded attempts
+    final_message_id: Optional[str]
+
+class KnowledgeBaseBatcher:
+    """Coalesces concurrent async knowledge base searches into batched vector store queries
+
+    A search is dispatched at once when no batch is in flight; questions arriving meanwhile
+    go out together as the next batch, so a lone request never waits on a batching window.
+    """
+
+    __slots__ = ("vector_store_manager", "k", "max_batch_size", "_pending", "_dispatcher")
+
+    def __init__(self, vector_store_manager, k: int = NODE_KB_K, max_batch_size: int = 32):
+        self.vector_store_manager = vector_store_manager
+        self.k = k
+        self.max_batch_size = max_batch_size
+        self._pending: List[tuple] = []
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def search(self, question: str):
+        """Return the (document, score) pairs for one question"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((question, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        return await future
+
+    async def _dispatch(self):
+        """Drain pending questions in batches of at most max_batch_size, resolving futures in order"""
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            try:
+                results = await self.vector_store_manager.abatch_similarity_search_with_score(
+                    [question for question, _ in batch], k=self.k
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), question_results in zip(batch, results):
+                # Callers that were cancelled while waiting leave a done future behind
+                if not future.done():
+                    future.set_result(question_results)
 
 class WorkflowNodes:
     """Contains all workflow node implementations"""
     
     def __init__(self, llm_input_guardrails, llm_output_guardrails, vector_store_manager, 
                  web_search_manager, dspy_optimizer):
+        # Import configuration from config
+        from config import KB_BATCH_MAX_SIZE
+        
         self.llm_input_guardrails = llm_input_guardrails
         self.llm_output_guardrails = llm_output_guardrails
         self.vector_store_manager = vector_store_manager
         self.web_search_manager = web_search_manager
         self.dspy_optimizer = dspy_optimizer
+        # Async knowledge base searches from concurrent requests share batched queries
+        self._kb_batcher = KnowledgeBaseBatcher(vector_store_manager, k=NODE_KB_K, max_batch_size=KB_BATCH_MAX_SIZE)
+        # Feedback is recorded off the request path; pending entries drain at exit
+        self._feedback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="feedback")
+        atexit.register(self._feedback_executor.shutdown)
     
     def input_guardrails_node(self, state: AgenticRAGState) -> AgenticRAGState:
-        """Node 1: Apply INPUT guardrails using Portkey"""
+        """Node 1: Apply INPUT guardrails (local checks plus an LLM verdict)"""
         try:
-            print("🛡️ Applying INPUT guardrails...")
-            
-            # Enhanced math keywords - more comprehensive list
-            math_keywords = [
-                # Basic operations
-                'equation', 'solve', 'find', 'calculate', 'determine', 'evaluate', 'compute',
-                # Algebra
-                'algebra', 'polynomial', 'quadratic', 'linear', 'variable', 'coefficient',
-                # Calculus
-                'derivative', 'integral', 'limit', 'differential', 'antiderivative',
-                # Geometry
-                'geometry', 'area', 'perimeter', 'volume', 'radius', 'diameter', 'triangle', 
-                'circle', 'rectangle', 'square', 'angle', 'pythagorean', 'theorem',
-                # Trigonometry
-                'trigonometry', 'sin', 'cos', 'tan', 'sine', 'cosine', 'tangent',
-                # General math
-                'mathematics', 'math', 'formula', 'function', 'graph', 'plot',
-                # Statistics
-                'statistics', 'probability', 'mean', 'median', 'mode', 'deviation',
-                # Other math concepts
-                'matrix', 'vector', 'logarithm', 'exponential', 'factorial', 'prime'
-            ]
-            
-            # Math operation verbs
-            math_verbs = ['explain', 'prove', 'show', 'demonstrate', 'derive', 'verify']
-            
-            question_lower = state["user_question"].lower()
-            
-            # Check for math keywords
-            has_math_keyword = any(keyword in question_lower for keyword in math_keywords)
-            
-            # Check for math operation verbs with math context
-            has_math_verb = any(verb in question_lower for verb in math_verbs)
-            
-            # Check for mathematical expressions (numbers, symbols)
-            has_math_symbols = bool(re.search(r'[0-9+\-*/=^()x²³√∫∂∑π]', question_lower))
-            
-            # More lenient validation - pass if ANY condition is met
-            is_math_question = has_math_keyword or (has_math_verb and has_math_symbols) or has_math_symbols
-            
-            # Additional Portkey validation
-            try:
-                test_message = [
-                    SystemMessage(content="Respond 'VALID' if this is a math question, 'INVALID' otherwise."),
-                    HumanMessage(content=state["user_question"])
-                ]
-                response = self.llm_input_guardrails.invoke(test_message)
-                portkey_validation = "VALID" in response.content.upper()
-            except:
-                portkey_validation = True  # Default to true if Portkey fails
-            
-            # Final decision - pass if either validation method succeeds
-            input_passed = is_math_question or portkey_validation
-            
-            print(f"   Math keywords: {has_math_keyword}")
-            print(f"   Math symbols: {has_math_symbols}")
-            print(f"   Portkey validation: {portkey_validation}")
-            print(f"   Input guardrails: {'PASSED' if input_passed else 'FAILED'}")
-            
+            logger.debug("Applying INPUT guardrails...")
+            has_math_keyword, has_math_symbols, is_math_question = self._input_heuristics(state["user_question"])
+            
+            # Additional Portkey validation, only needed when the local checks reject the question
+            # and it is long enough to be ambiguous; short non-math text is rejected outright
+            portkey_validation = None
+            if not is_math_question and self._is_short_question(state["user_question"]):
+                portkey_validation = False
+            elif not is_math_question:
+                try:
+                    portkey_validation = self._cached_input_verdict(state["user_question"])
+                    if portkey_validation is None:
+                        response = self.llm_input_guardrails.invoke(self._input_validation_messages(state))
+                        portkey_validation = self._parse_input_verdict(response.content)
+                        self._store_input_verdict(state["user_question"], portkey_validation)
+                except:
+                    portkey_validation = True  # Default to true if the LLM check fails
+            
+            return self._input_guardrails_update(has_math_keyword, has_math_symbols, is_math_question, portkey_validation)
+        except Exception as e:
+            logger.error("Input guardrails error: %s", e)
             return {
-                **state,
-                "input_guardrails_passed": input_passed,
-                "error_message": None if input_passed else "Question failed input validation - not a valid math question"
+                "input_guardrails_passed": False,
+                "error_message": f"Input guardrails error: {str(e)}"
             }
+
+    async def input_guardrails_node_async(self, state: AgenticRAGState) -> AgenticRAGState:
+        """Async variant of input_guardrails_node using the pooled async client"""
+        try:
+            logger.debug("Applying INPUT guardrails...")
+            has_math_keyword, has_math_symbols, is_math_question = self._input_heuristics(state["user_question"])
+            
+            # Additional Portkey validation, only needed when the local checks reject the question
+            # and it is long enough to be ambiguous; short non-math text is rejected outright
+            portkey_validation = None
+            if not is_math_question and self._is_short_question(state["user_question"]):
+                portkey_validation = False
+            elif not is_math_question:
+                try:
+                    portkey_validation = self._cached_input_verdict(state["user_question"])
+                    if portkey_validation is None:
+                        response = await self.llm_input_guardrails.ainvoke(self._input_validation_messages(state))
+                        portkey_validation = self._parse_input_verdict(response.content)
+                        self._store_input_verdict(state["user_question"], portkey_validation)
+                except:
+                    portkey_validation = True  # Default to true if the LLM check fails
+            
+            return self._input_guardrails_update(has_math_keyword, has_math_symbols, is_math_question, portkey_validation)
         except Exception as e:
-            print(f" Input guardrails error: {str(e)}")
+            logger.error("Input guardrails error: %s", e)
             return {
-                **state,
                 "input_guardrails_passed": False,
                 "error_message": f"Input guardrails error: {str(e)}"
             }
 
+    def _input_heuristics(self, question: str):
+        """Local keyword and symbol checks: (has_math_keyword, has_math_symbols, is_math_question)"""
+        # Check for math keywords
+        has_math_keyword = bool(MATH_KEYWORD_PATTERN.search(question))
+        
+        # Check for mathematical expressions (numbers, symbols)
+        has_math_symbols = bool(MATH_SYMBOL_PATTERN.search(question))
+        
+        # More lenient validation - pass if ANY condition is met; math verbs only ever
+        # counted together with symbols, which pass on their own
+        is_math_question = has_math_keyword or has_math_symbols
+        
+        return has_math_keyword, has_math_symbols, is_math_question
+
+    def _is_short_question(self, question: str) -> bool:
+        """Whether a question that failed the local checks is too short to be worth an LLM verdict"""
+        return len(question.split()) < INPUT_LLM_MIN_WORDS
+
+    def _input_validation_messages(self, state: AgenticRAGState):
+        """Messages for the LLM input validation call"""
+        return [
+            INPUT_GUARDRAIL_SYSTEM_MESSAGE,
+            HumanMessage(content=state["user_question"])
+        ]
+
+    def _parse_input_verdict(self, content: str) -> bool:
+        """Read the JSON verdict returned by the input validation LLM"""
+        return str(json.loads(content).get("verdict", "")).upper() == "VALID"
+
+    def _input_verdict_key(self, question: str) -> bytes:
+        """Digest of the lowercased, whitespace-collapsed question"""
+        return hashlib.blake2b(" ".join(question.lower().split()).encode(), digest_size=16).digest()
+
+    def _cached_input_verdict(self, question: str) -> Optional[bool]:
+        """Return an unexpired LLM verdict for this question, or None on a miss"""
+        key = self._input_verdict_key(question)
+        with _INPUT_VERDICT_CACHE_LOCK:
+            entry = _INPUT_VERDICT_CACHE.get(key)
+            if entry is None:
+                return None
+            expires_at, verdict = entry
+            if expires_at < time.monotonic():
+                del _INPUT_VERDICT_CACHE[key]
+                return None
+            _INPUT_VERDICT_CACHE.move_to_end(key)
+            return verdict
+
+    def _store_input_verdict(self, question: str, verdict: bool):
+        """Cache a parsed LLM verdict, evicting the least recently used"""
+        key = self._input_verdict_key(question)
+        with _INPUT_VERDICT_CACHE_LOCK:
+            _INPUT_VERDICT_CACHE[key] = (time.monotonic() + INPUT_VERDICT_CACHE_TTL_SECONDS, verdict)
+            _INPUT_VERDICT_CACHE.move_to_end(key)
+            if len(_INPUT_VERDICT_CACHE) > INPUT_VERDICT_CACHE_MAX_SIZE:
+                _INPUT_VERDICT_CACHE.popitem(last=False)
+
+    def _input_guardrails_update(self, has_math_keyword, has_math_symbols, is_math_question, portkey_validation) -> AgenticRAGState:
+        """Combine the local and LLM verdicts into the input_guardrails_passed update"""
+        # Final decision - pass if either validation method succeeds (portkey_validation is None when skipped)
+        input_passed = is_math_question or bool(portkey_validation)
+        
+        logger.debug(
+            "Math keywords: %s, math symbols: %s, Portkey validation: %s, input guardrails: %s",
+            has_math_keyword,
+            has_math_symbols,
+            "skipped" if portkey_validation is None else portkey_validation,
+            "PASSED" if input_passed else "FAILED"
+        )
+        
+        return {
+            "input_guardrails_passed": input_passed,
+            "error_message": None if input_passed else "Question failed input validation - not a valid math question"
+        }
+
     def vector_search_node(self, state: AgenticRAGState) -> AgenticRAGState:
         """Node 2: Search in knowledge base using vector search"""
-        if not state["input_guardrails_passed"]:
-            return state
-        
+        # Runs alongside the input guardrails, so there is no verdict to check yet;
+        # solution_generation discards the results if the question is rejected
         try:
-            print("Searching knowledge base...")
+            logger.debug("Searching knowledge base...")
             
             # Search for similar problems in knowledge base
-            results = self.vector_store_manager.similarity_search_with_score(state["user_question"], k=3)
-            
-            knowledge_results = []
-            for doc, score in results:
-                result = {
-                    'question': doc.metadata['question'],
-                    'answer': doc.metadata['answer'],
-                    'topic': doc.metadata['topic'],
-                    'score': float(score),
-                    'content': doc.page_content
-                }
-                knowledge_results.append(result)
-            
-            print(f"   Found {len(knowledge_results)} similar problems")
-            
-            return {
-                **state,
-                "knowledge_base_results": knowledge_results
-            }
+            results = self.vector_store_manager.similarity_search_with_score(state["user_question"], k=NODE_KB_K)
+            return self._knowledge_base_update(results)
         except Exception as e:
-            print(f" Vector search error: {str(e)}")
-            return {
-                **state,
-                "error_message": f"Vector search error: {str(e)}"
-            }
+            logger.error("Vector search error: %s", e)
+            return {"error_message": f"Vector search error: {str(e)}"}
+
+    async def vector_search_node_async(self, state: AgenticRAGState) -> AgenticRAGState:
+        """Async variant of vector_search_node, run concurrently with the input guardrails"""
+        # Runs alongside the input guardrails, so there is no verdict to check yet;
+        # solution_generation discards the results if the question is rejected
+        try:
+            logger.debug("Searching knowledge base...")
+            results = await self._kb_batcher.search(state["user_question"])
+            return self._knowledge_base_update(results)
+        except Exception as e:
+            logger.error("Vector search error: %s", e)
+            return {"error_message": f"Vector search error: {str(e)}"}
+
+    async def batch_vector_search(self, questions: List[str], k: int = NODE_KB_K) -> List[List[KBHit]]:
+        """Search the knowledge base for several questions with one embedding pass and one batched query"""
+        results = await self.vector_store_manager.abatch_similarity_search_with_score(questions, k=k)
+        return [self._knowledge_results(question_results) for question_results in results]
+
+    def _knowledge_base_update(self, results) -> AgenticRAGState:
+        """Convert (document, score) pairs into the knowledge_base_results update"""
+        knowledge_results = self._knowledge_results(results)
+        
+        logger.debug("Found %d similar problems", len(knowledge_results))
+        
+        return {"knowledge_base_results": knowledge_results}
+
+    def _knowledge_results(self, results) -> List[KBHit]:
+        """Convert (document, score) pairs into knowledge base hits"""
+        return [
+            KBHit(
+                doc.metadata.get('id'),
+                doc.metadata['question'],
+                doc.metadata['answer'],
+                doc.metadata['topic'],
+                float(score),
+                doc.page_content
+            )
+            for doc, score in results
+        ]
 
     def web_search_node(self, state: AgenticRAGState) -> AgenticRAGState:
-        """Node 3: Perform web search using Tavily"""
+        """Node 3: Perform web search using Tavily unless the knowledge base already has a confident match"""
         if not state["input_guardrails_passed"]:
-            return state
+            return {}
         
         try:
-            print("Performing web search...")
+            # Usually served from the search cache filled by the vector_search branch
+            kb_results = self.vector_store_manager.similarity_search_with_score(state["user_question"], k=NODE_KB_K)
+            if kb_results and self.vector_store_manager.is_confident_hit(kb_results[0][1]):
+                logger.debug("Skipping web search - confident knowledge base match found")
+                return {}
             
-            # Only do web search if no good knowledge base results found
-            should_search = (not state["knowledge_base_results"] or 
-                           state["knowledge_base_results"][0]["score"] > 0.7)
+            logger.debug("Performing web search...")
             
-            if should_search:
-                search_query = f"solve step by step math problem: {state['user_question']}"
-                web_results = self.web_search_manager.search(search_query)
-                processed_results = self.web_search_manager.process_results(web_results, max_results=3)
-                
-                print(f"   Found {len(processed_results)} web resources")
-                
-                return {
-                    **state,
-                    "web_search_results": processed_results
-                }
-            else:
-                print("   Skipped web search - good knowledge base match found")
-                return {
-                    **state,
-                    "web_search_results": []
-                }
+            search_query = f"solve step by step math problem: {state['user_question']}"
+            web_results = self.web_search_manager.search(search_query)
+            return self._web_search_update(web_results)
         except Exception as e:
-            print(f" Web search error: {str(e)}")
-            return {
-                **state,
-                "error_message": f"Web search error: {str(e)}"
-            }
+            logger.error("Web search error: %s", e)
+            return {"error_message": f"Web search error: {str(e)}"}
+
+    async def web_search_node_async(self, state: AgenticRAGState) -> AgenticRAGState:
+        """Async variant of web_search_node: Tavily starts alongside the knowledge base check and is cancelled on a confident hit"""
+        if not state["input_guardrails_passed"]:
+            return {}
+        
+        search_query = f"solve step by step math problem: {state['user_question']}"
+        web_task = asyncio.create_task(self.web_search_manager.asearch(search_query))
+        # Mark a failure as retrieved in case the task is abandoned after a confident hit
+        web_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            kb_results = await self._kb_batcher.search(state["user_question"])
+            if kb_results and self.vector_store_manager.is_confident_hit(kb_results[0][1]):
+                logger.debug("Skipping web search - confident knowledge base match found")
+                return {}
+            
+            logger.debug("Performing web search...")
+            web_results = await web_task
+            return self._web_search_update(web_results)
+        except Exception as e:
+            logger.error("Web search error: %s", e)
+            return {"error_message": f"Web search error: {str(e)}"}
+        finally:
+            # No-op once the search has finished; drops the in-flight request otherwise
+            web_task.cancel()
+
+    def _web_search_update(self, web_results) -> AgenticRAGState:
+        """Convert raw Tavily results into the web_search_results update"""
+        processed_results = self.web_search_manager.process_results(web_results, max_results=NODE_WEB_K)
+        
+        logger.debug("Found %d web resources", len(processed_results))
+        
+        return {"web_search_results": processed_results}
+
+    def _has_confident_kb_hit(self, state: AgenticRAGState) -> bool:
+        """Whether the top knowledge base result is a confident match for the question"""
+        return bool(state["knowledge_base_results"]) and \
+            self.vector_store_manager.is_confident_hit(state["knowledge_base_results"][0].score)
+
+    def _should_use_web_results(self, state: AgenticRAGState) -> bool:
+        """Skip web context on a confident knowledge base match"""
+        return not self._has_confident_kb_hit(state)
 
     def solution_generation_node(self, state: AgenticRAGState) -> AgenticRAGState:
         """Node 4: Generate raw solution using DSPy (before output guardrails)"""
         if not state["input_guardrails_passed"]:
-            return state
+            return {}
         
         try:
-            print("Generating initial solution...")
+            logger.debug("Generating initial solution...")
             
-            # Prepare context from knowledge base and web results
-            context = ""
+            # Prepare context from knowledge base and web results, joined once at the end
+            parts = []
+            # Identities of the sources placed in the context, so identical retrievals reuse a cached solution
+            source_ids = []
             
             if state["knowledge_base_results"]:
-                context += "Knowledge Base Results:\n"
-                for i, result in enumerate(state["knowledge_base_results"][:2], 1):
-                    context += f"{i}. Question: {result['question']}\n   Answer: {result['answer']}\n\n"
+                parts.append("Knowledge Base Results:\n")
+                for i, result in enumerate(state["knowledge_base_results"], 1):
+                    parts.append(f"{i}. Question: {result.question}\n   Answer: {result.answer}\n\n")
+                    source_ids.append(result.id or result.question)
+            
+            if state["web_search_results"] and self._should_use_web_results(state):
+                parts.append("Web Search Results:\n")
+                for i, result in enumerate(state["web_search_results"], 1):
+                    parts.append(f"{i}. {result['title']}\n   Content: {result['content']}\n\n")
+                    source_ids.append(result['url'] or result['title'])
+            elif state["web_search_results"]:
+                logger.debug("Skipped web results - good knowledge base match found")
             
-            if state["web_search_results"]:
-                context += "Web Search Results:\n"
-                for i, result in enumerate(state["web_search_results"][:2], 1):
-                    context += f"{i}. {result['title']}\n   Content: {result['content']}\n\n"
+            context = "".join(parts)
             
             # Generate raw solution using DSPy
-            if context:
-                raw_solution = self.dspy_optimizer.solve_problem(state["user_question"], context)
-            else:
-                raw_solution = self.dspy_optimizer.solve_problem(state["user_question"])
+            raw_solution = self.dspy_optimizer.solve_problem(
+                state["user_question"], context, retrieval_key="|".join(source_ids)
+            )
             
-            print(f"   Generated solution: {len(raw_solution)} characters")
+            logger.debug("Generated solution: %d characters", len(raw_solution))
             
             return {
-                **state,
                 "raw_solution": raw_solution,
                 "guardrail_attempts": 0
             }
             
         except Exception as e:
-            print(f" Solution generation error: {str(e)}")
-            return {
-                **state,
-                "error_message": f"Solution generation error: {str(e)}"
-            }
+            logger.error("Solution generation error: %s", e)
+            return {"error_message": f"Solution generation error: {str(e)}"}
+
+    async def solution_generation_node_async(self, state: AgenticRAGState) -> AgenticRAGState:
+        """Async variant of solution_generation_node; DSPy is synchronous, so it runs in a worker thread"""
+        return await asyncio.to_thread(self.solution_generation_node, state)
 
     def output_guardrails_node(self, state: AgenticRAGState) -> AgenticRAGState:
-        """Node 5: Apply OUTPUT guardrails using Portkey"""
+        """Node 5: Apply OUTPUT guardrails (LLM formatting, validated locally)"""
         if not state["input_guardrails_passed"] or not state["raw_solution"]:
-            return state
+            return {}
         
         try:
-            print("Applying OUTPUT guardrails...")
-            
-            # Import format_solution_manually function
-            from guardrails import format_solution_manually
+            logger.debug("Applying OUTPUT guardrails...")
             
             # Create a proper solution prompt for guardrails
-            solution_prompt = f"""
-Please format this math solution properly with clear steps:
-
-Original Question: {state["user_question"]}
-
-Raw Solution: {state["raw_solution"]}
-
-Requirements:
-1. Start with "Solution:"
-2. Break down into numbered steps
-3. Show all calculations clearly
-4. End with "Therefore, the final answer is..."
-5. Use proper mathematical notation
-
-Please provide a well-structured solution:
-"""
+            messages = self._output_guardrail_messages(state)
             
             max_attempts = 3
             attempt = state.get("guardrail_attempts", 0)
             
             while attempt < max_attempts:
                 try:
-                    print(f"   Attempt {attempt + 1}/{max_attempts}")
+                    logger.debug("Attempt %d/%d", attempt + 1, max_attempts)
                     
                     # This will trigger output guardrails
-                    guardrailed_response = self.llm_output_guardrails.invoke([
-                        SystemMessage(content="You are a math tutor providing step-by-step solutions. Always follow the formatting requirements."),
-                        HumanMessage(content=solution_prompt)
-                    ])
+                    guardrailed_response = self.llm_output_guardrails.invoke(messages)
                     
                     final_solution = guardrailed_response.content
-                    
-                    # Additional manual validation
-                    required_elements = ["step", "solution", "answer"]
-                    has_elements = any(element.lower() in final_solution.lower() for element in required_elements)
-                    is_long_enough = len(final_solution) >= 100
-                    
-                    if has_elements and is_long_enough:
-                        print(" Output guardrails PASSED")
+                    if self._output_is_valid(final_solution):
+                        logger.debug("Output guardrails PASSED")
                         return {
-                            **state,
                             "final_solution": final_solution,
                             "output_guardrails_passed": True,
-                            "guardrail_attempts": attempt + 1
+                            "guardrail_attempts": attempt + 1,
+                            "final_message_id": guardrailed_response.id
                         }
                     else:
                         attempt += 1
-                        print(f" Output validation failed on attempt {attempt}")
+                        logger.debug("Output validation failed on attempt %d", attempt)
                         
                 except Exception as guardrail_error:
                     attempt += 1
-                    print(f" Output guardrails triggered on attempt {attempt}: {str(guardrail_error)}")
+                    logger.warning("Output guardrails triggered on attempt %d: %s", attempt, guardrail_error)
             
-            # Fallback: Use manual formatting if all attempts fail
-            print(" Using fallback manual formatting")
-            fallback_solution = format_solution_manually(state["raw_solution"], state["user_question"])
+            return self._output_fallback_update(state, max_attempts)
             
-            return {
-                **state,
-                "final_solution": fallback_solution,
-                "output_guardrails_passed": False,
-                "guardrail_attempts": max_attempts,
-                "error_message": "Output guardrails failed, used fallback formatting"
-            }
+        except Exception as e:
+            return self._output_error_update(state, e)
+
+    async def output_guardrails_node_async(self, state: AgenticRAGState) -> AgenticRAGState:
+        """Async variant of output_guardrails_node using the pooled async client"""
+        if not state["input_guardrails_passed"] or not state["raw_solution"]:
+            return {}
+        
+        try:
+            logger.debug("Applying OUTPUT guardrails...")
+            
+            # Create a proper solution prompt for guardrails
+            messages = self._output_guardrail_messages(state)
+            
+            max_attempts = 3
+            attempt = state.get("guardrail_attempts", 0)
+            
+            # Speculatively run all remaining attempts at once and keep the first valid response,
+            # so a failed attempt no longer adds a full LLM round-trip to the latency
+            logger.debug("Running attempts %d-%d concurrently", attempt + 1, max_attempts)
+            tasks = [
+                asyncio.create_task(self.llm_output_guardrails.ainvoke(messages))
+                for _ in range(max_attempts - attempt)
+            ]
+            try:
+                for next_response in asyncio.as_completed(tasks):
+                    attempt += 1
+                    try:
+                        # This will trigger output guardrails
+                        guardrailed_response = await next_response
+                    except Exception as guardrail_error:
+                        logger.warning("Output guardrails triggered on attempt %d: %s", attempt, guardrail_error)
+                        continue
+                    
+                    final_solution = guardrailed_response.content
+                    if self._output_is_valid(final_solution):
+                        logger.debug("Output guardrails PASSED")
+                        return {
+                            "final_solution": final_solution,
+                            "output_guardrails_passed": True,
+                            "guardrail_attempts": attempt,
+                            "final_message_id": guardrailed_response.id
+                        }
+                    logger.debug("Output validation failed on attempt %d", attempt)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                # Collect every attempt so failures of discarded ones are retrieved and reported
+                for outcome in await asyncio.gather(*tasks, return_exceptions=True):
+                    if isinstance(outcome, Exception) and not isinstance(outcome, asyncio.CancelledError):
+                        logger.debug("Output guardrails attempt failed: %s", outcome)
+            
+            return self._output_fallback_update(state, max_attempts)
             
         except Exception as e:
-            print(f"Output guardrails error: {str(e)}")
-            from guardrails import format_solution_manually
-            fallback_solution = format_solution_manually(
-                state.get("raw_solution", "No solution generated"), 
-                state["user_question"]
-            )
-            return {
-                **state,
-                "final_solution": fallback_solution,
-                "output_guardrails_passed": False,
-                "error_message": f"Output guardrails error: {str(e)}"
-            }
+            return self._output_error_update(state, e)
+
+    def _output_guardrail_messages(self, state: AgenticRAGState):
+        """Messages asking the output guardrails LLM to format the raw solution"""
+        return [
+            OUTPUT_GUARDRAIL_SYSTEM_MESSAGE,
+            HumanMessage(content=self._output_solution_prompt(state))
+        ]
+
+    def _output_solution_prompt(self, state: AgenticRAGState) -> str:
+        """Formatting prompt sent through the output guardrails"""
+        return f"""
+Please format this math solution properly with clear steps:
+
+Original Question: {state["user_question"]}
+
+Raw Solution: {state["raw_solution"]}
+
+Requirements:
+1. Start with "Solution:"
+2. Break down into numbered steps
+3. Show all calculations clearly
+4. End with "Therefore, the final answer is..."
+5. Use proper mathematical notation
+
+Please provide a well-structured solution:
+"""
+
+    def _output_is_valid(self, final_solution: str) -> bool:
+        """Additional manual validation of a guardrailed solution"""
+        # Length is O(1); the single case-insensitive scan stops at the first required element
+        return len(final_solution) >= OUTPUT_MIN_LENGTH and OUTPUT_REQUIRED_PATTERN.search(final_solution) is not None
+
+    def _output_fallback_update(self, state: AgenticRAGState, max_attempts: int) -> AgenticRAGState:
+        """Fallback: Use manual formatting if all attempts fail"""
+        from guardrails import format_solution_manually
+        
+        logger.debug("Using fallback manual formatting")
+        fallback_solution = format_solution_manually(state["raw_solution"], state["user_question"])
+        
+        return {
+            "final_solution": fallback_solution,
+            "output_guardrails_passed": False,
+            "guardrail_attempts": max_attempts,
+            "error_message": "Output guardrails failed, used fallback formatting"
+        }
+
+    def _output_error_update(self, state: AgenticRAGState, e: Exception) -> AgenticRAGState:
+        """Manually formatted solution when the output guardrails step itself errors"""
+        from guardrails import format_solution_manually
+        
+        logger.error("Output guardrails error: %s", e)
+        fallback_solution = format_solution_manually(
+            state.get("raw_solution", "No solution generated"), 
+            state["user_question"]
+        )
+        return {
+            "final_solution": fallback_solution,
+            "output_guardrails_passed": False,
+            "error_message": f"Output guardrails error: {str(e)}"
+        }
 
     def feedback_collection_node(self, state: AgenticRAGState) -> AgenticRAGState:
         """Node 6: Collect human feedback (simulated for demo)"""
         if not state["input_guardrails_passed"] or not state["final_solution"]:
-            return state
+            return {}
         
         try:
-            print(" Collecting feedback...")
+            logger.debug("Collecting feedback...")
             
             # In a real application, this would collect actual user feedback
             # For demo purposes, we'll simulate feedback based on output guardrails performance
@@ -335,21 +652,28 @@ Please provide a well-structured solution:
                     }
                 }
             
-            # Collect feedback using DSPy optimizer
-            self.dspy_optimizer.collect_feedback(
+            # Collect feedback using DSPy optimizer in the background
+            self._feedback_executor.submit(
+                self._record_feedback,
                 state["user_question"],
                 state["final_solution"],
                 simulated_feedback["rating"],
                 simulated_feedback["comments"]
             )
             
-            print(f"   Rating: {simulated_feedback['rating']}/5")
+            logger.debug("Rating: %d/5", simulated_feedback["rating"])
             
             return {
-                **state,
                 "feedback_rating": simulated_feedback["rating"],
                 "feedback_comments": simulated_feedback["comments"]
             }
         except Exception as e:
-            print(f"Feedback collection error: {str(e)}")
-            return state
\ No newline at end of file
+            logger.error("Feedback collection error: %s", e)
+            return {}
+
+    def _record_feedback(self, question: str, solution: str, rating: int, comments: Dict):
+        """Store feedback with the DSPy optimizer; runs on the feedback executor"""
+        try:
+            self.dspy_optimizer.collect_feedback(question, solution, rating, comments)
+        except Exception as e:
+            logger.error("Feedback collection error: %s", e)
\ No newline at end of file